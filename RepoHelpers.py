@@ -1,23 +1,41 @@
 import re
-import subprocess
+import hashlib
 import json
 import os
+import stat
 import textwrap
+import time
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from io import BytesIO
 from pathlib import Path
-from typing import Optional, Dict, List, Tuple, Any
+from typing import Optional, Dict, Iterator, List, Tuple, Any
 
-from git import Repo, GitCommandError, InvalidGitRepositoryError, NoSuchPathError, BadName
-from google import genai
+from git import Repo, GitCommandError, InvalidGitRepositoryError, NoSuchPathError, BadName, BaseIndexEntry
+from gitdb import IStream
 
 from tqdm import tqdm
 
-with open('config.json', 'r') as f:
-    config = json.load(f)
+from config import get_config
+from logger import log
 
-gemini_config = config.get('gemini')
-api_key = gemini_config.get('key')
-model = gemini_config.get('model')
+# (status, path) for every staged change, see staged_manifest
+StagedManifest = Tuple[Tuple[str, str], ...]
+
+# Gemini key and model from config.json, read on first use rather than at import
+def _gemini_settings() -> Tuple[str, str]:
+    gemini_config = get_config().get('gemini')
+    return gemini_config.get('key'), gemini_config.get('model')
+
+# One Gemini client for the process, so the secret scan and the commit message reuse its
+# kept-alive connections instead of each call opening its own
+@lru_cache(maxsize=1)
+def _genai_client():
+    # The SDK is imported here so importing RepoHelpers (and workflows, executer) doesn't load it
+    from google import genai
+    api_key, _model = _gemini_settings()
+    return genai.Client(api_key=api_key)
 
 SECRET_TOKEN_PATTERNS = [
     r"AKIA[0-9A-Z]{16}",  # AWS Access Key ID
@@ -29,17 +47,26 @@ SECRET_TOKEN_PATTERNS = [
     r"sk_live_[0-9A-Za-z]{24,}",  # Stripe live secret
     r"sk-[A-Za-z0-9]{20,48}",  # OpenAI style
     r"(?i:Bearer\s+[A-Za-z0-9\-\._=]{20,})",  # Bearer tokens
-    r"\b[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{8,}\b",  # JWT tokens
-    r"\beyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{8,}\b",  # JWT tokens
-    r"(?<![A-Za-z0-9_-])eyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{8,}(?![A-Za-z0-9_-])",  # JWT token
-    r"(?<![A-Za-z0-9_-])sk-[A-Za-z0-9]{8,19}(?![A-Za-z0-9_-])",  # OpenAI short token
-    r"(?<![A-Za-z0-9_-])eyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}(?:\.[A-Za-z0-9_-]{8,})?(?![A-Za-z0-9_-])", # JWT tokn
+    # The next two check the char before the literal with a lookbehind placed *after* it, so the
+    # pattern still starts with a literal and re can jump between candidates with a fast search
+    r"sk-(?<![A-Za-z0-9_-]sk-)[A-Za-z0-9]{8,19}(?![A-Za-z0-9_-])",  # OpenAI short token
+    # JWT tokens (signature optional). The lookbehind only lets a match start at the
+    # beginning of a token run, so a long run without dots is scanned once, not once per char
+    r"eyJ(?<![A-Za-z0-9_-]eyJ)[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}(?:\.[A-Za-z0-9_-]{8,})?(?![A-Za-z0-9_-])",
 ]
 
+# Compiled separately: each pattern starts with a literal prefix that re scans for natively,
+# which is several times faster than one alternation that has to try every branch at every char
+_TOKEN_RXS = [re.compile(p) for p in SECRET_TOKEN_PATTERNS]
+
+# The key part only requires the last two key characters before the separator. A longer
+# key can't change which value gets masked, and an open-ended key run would be re-scanned
+# from every position of a long run with no ':' or '=' after it (quadratic). It also has to
+# match right after a '.', e.g. the "password" in "user=<value>.password=<value>"
 KV_VALUE_PATTERNS = [
     (
         re.compile(
-            r'([A-Za-z0-9_.-]{2,}\s*[:=]\s*)(["\']?)([A-Za-z0-9_\-\/\+=]{16,})(\2)'
+            r'([A-Za-z0-9_.-]{2}\s*[:=]\s*)(["\']?)([A-Za-z0-9_\-\/\+=]{16,})(\2)'
         ),
         1,
         2,
@@ -48,7 +75,7 @@ KV_VALUE_PATTERNS = [
     ),
     (
         re.compile(
-            r'((?:export\s+)?[A-Za-z0-9_.-]{2,}\s*[:=]\s*)(["\'`]?)(sk-[A-Za-z0-9]{8,48})(\2)',
+            r'((?:export\s+)?[A-Za-z0-9_.-]{2}\s*[:=]\s*)(["\'`]?)(sk-[A-Za-z0-9]{8,48})(\2)',
             re.IGNORECASE,
         ),
         1,  # prefix
@@ -58,6 +85,14 @@ KV_VALUE_PATTERNS = [
     ),
 ]
 
+# Literal fragments at least one of which has to be present for any pattern above to match.
+# Keep in sync with SECRET_TOKEN_PATTERNS and KV_VALUE_PATTERNS.
+_SECRET_ANCHORS = (
+    b"=", b":",  # KV patterns
+    b"AKIA", b"ASIA", b"AIza", b"ghp_", b"github_pat_", b"xox", b"sk_live_", b"sk-", b"eyJ",
+)
+_BEARER_ANCHOR = re.compile(rb"(?i)bearer")
+
 # Get the repo if it exists
 def get_git_root(path='.') -> Optional[Repo]:
     path = Path(path).resolve()
@@ -71,12 +106,28 @@ def get_git_root(path='.') -> Optional[Repo]:
         return None
 
 # Fetch from remote if it exists
+# Seconds a successful fetch is reused for before the remote is asked again
+FETCH_TTL = 30.0
+
+# working_dir -> monotonic deadline of the last successful fetch
+_fetch_cache: Dict[str, float] = {}
+
+# Forget the last fetch for a repo (e.g. after a push moved the remote)
+def invalidate_fetch_cache(repo: Repo) -> None:
+    _fetch_cache.pop(repo.working_dir, None)
+
 def fetch_from_remote(repo: Repo) -> bool:
+    # Skip the network round trip if this repo was fetched moments ago
+    deadline = _fetch_cache.get(repo.working_dir)
+    if deadline is not None and time.monotonic() < deadline:
+        log.info('Fetched recently, skipping fetch')
+        return True
+
     remotes = repo.remotes
     
     # Return false if repo is local and doesn't have any remotes
     if not remotes:
-        print('Repo is local and doesn\'t have a remote')
+        log.warning('Repo is local and doesn\'t have a remote')
         return False
     
     remote = None
@@ -86,152 +137,237 @@ def fetch_from_remote(repo: Repo) -> bool:
         remote = remotes[0]
         
     try:
-        remote.fetch()
+        remote.fetch(kill_after_timeout=10)
+        _fetch_cache[repo.working_dir] = time.monotonic() + FETCH_TTL
         return True
     except GitCommandError as e:
-        print(f'Failed to fetch: {e}')
+        log.error(f'Failed to fetch: {e}')
         return False
 
+# Fetch on its own Repo instance so it can run on a thread next to other git work
+def fetch_repo_dir(repo_dir: str) -> bool:
+    with Repo(repo_dir) as repo:
+        return fetch_from_remote(repo)
+
 # Check if any changes are staged
 def anything_staged(repo: Repo) -> bool:
+    # diff-index --quiet answers with its exit code alone: 0 is nothing staged, 1 is changes
     try:
-        staged = repo.git.diff('--cached', '--name-only').splitlines()
-        return bool(staged)
-    except:
-        # This runs when we do our first commit in a new repo
+        repo.git.diff_index('--cached', '--quiet', 'HEAD', '--')
+        return False
+    except GitCommandError as e:
+        if e.status == 1:
+            return True
+        # This runs when we do our first commit in a new repo (or git can't diff HEAD)
         return bool(repo.index.entries)
 
-# Only scan text apprent files, skip any binary files
-def _is_probably_text(data: bytes) -> bool:
+# Only scan text apprent files, skip any binary files. Returns the decoded text, or None for binary
+def _decode_text(data: bytes) -> Optional[str]:
     if b"\x00" in data:
-        return False
+        return None
     try:
-        data.decode("utf-8")
-        return True
+        return data.decode("utf-8")
     except UnicodeDecodeError:
-        return False
+        return None
+
+# Cheap byte-level check run before the regexes, False means no pattern can match
+def _may_contain_secret(data: bytes) -> bool:
+    return any(a in data for a in _SECRET_ANCHORS) or _BEARER_ANCHOR.search(data) is not None
+
+# KV patterns with the group holding the value, only that group gets masked
+_KV_VALUE_GROUPS = [(rx, g_value) for rx, _g_prefix, _g_open, g_value, _g_suffix in KV_VALUE_PATTERNS]
+
+# Sort [start,end) ranges, drop out-of-bounds ones and merge overlapping (or touching) ones
+def _merge_ranges(ranges: list[tuple[int, int]], n: int) -> list[tuple[int, int]]:
+    merged: list[tuple[int, int]] = []
+    for (start, end) in sorted(ranges):
+        if not (0 <= start < end <= n):
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+# Replace [start,end) ranges of text in one forward pass, overlapping ranges are merged
+def _apply_replacements_by_ranges(text: str, ranges: list[tuple[int, int]], replacement: str = "api_key") -> str:
+    parts = []
+    prev = 0
+    for (start, end) in _merge_ranges(ranges, len(text)):
+        parts.append(text[prev:start])
+        parts.append(replacement)
+        prev = end
+    parts.append(text[prev:])
+    return "".join(parts)
 
 # Change anything that looks like an api key to "api_key"
 def _sanitize_text(s: str) -> Tuple[str, bool]:
-    changed = False
+    # Every pattern runs against the original text and the spans are spliced once, so no pattern
+    # re-scans (or re-matches) text another one already replaced
+    spans = []
     
-    # Try to preserve keys: replace only values after ':' or '='
-    for rx, g_prefix, g_open, g_value, g_suffix in KV_VALUE_PATTERNS:
-        def repl(m):
-            nonlocal changed
-            changed = True
-            openq = m.group(g_open) or ''
-            closeq = m.group(g_suffix) or ''
-            return m.group(g_prefix) + openq +"api_key" + closeq
-        
-        s2 = rx.sub(repl, s)
-        s, changed = s2, (changed or s2 != s)
+    # Try to preserve keys: replace only values after ':' or '='. Both KV patterns need one
+    # of those characters, so skip them when neither is present
+    if "=" in s or ":" in s:
+        for rx, g_value in _KV_VALUE_GROUPS:
+            spans.extend(m.span(g_value) for m in rx.finditer(s))
         
     # Blanket replace raw tokens that look like secrets
-    before = s
-    token_union = re.compile('|'.join(f'(?:{p})' for p in SECRET_TOKEN_PATTERNS))
-    s = token_union.sub('api_key', s)
+    for rx in _TOKEN_RXS:
+        spans.extend(m.span() for m in rx.finditer(s))
     
-    if s != before:
-        changed = True
-        
-    return s, changed
+    if not spans:
+        return s, False
+    return _apply_replacements_by_ranges(s, spans), True
+
+# Staged files bigger than this (vendored bundles, dumps, assets) aren't scanned for secrets
+MAX_SCAN_BYTES = 2_000_000
+# A NUL byte in this much of the start of a file marks it as binary
+_BINARY_SNIFF_BYTES = 8192
+
+# Read the staged content of an index entry straight from the object database. Oversized
+# blobs are skipped from a size-only lookup, binary ones after a look at their first few KB
+def _read_staged_blob(repo: Repo, entry: BaseIndexEntry) -> Optional[bytes]:
+    try:
+        # `cat-file --batch-check`: the size without any of the content
+        if repo.odb.info(entry.binsha).size > MAX_SCAN_BYTES:
+            return None
+        stream = repo.odb.stream(entry.binsha)
+    except Exception:
+        # Fall back to working tree if the object can't be read
+        wt = Path(repo.working_tree_dir or '.') / entry.path
+
+        if not wt.is_file() or wt.stat().st_size > MAX_SCAN_BYTES:
+            return None
+
+        with open(wt, 'rb') as f:
+            head = f.read(_BINARY_SNIFF_BYTES)
+            if b"\x00" in head:
+                return None
+            return head + f.read()
+
+    head = stream.read(_BINARY_SNIFF_BYTES)
+    if b"\x00" in head:
+        # The rest has to come off the shared cat-file pipe anyway; left unread, GitPython
+        # would swallow it in one read when the stream is collected
+        while stream.read(64 * 1024):
+            pass
+        return None
+    return head + stream.read()
+
+# Write new content for an index entry as a blob and return the entry pointing at it
+def _store_staged_blob(repo: Repo, entry: BaseIndexEntry, text: str) -> BaseIndexEntry:
+    data = text.encode('utf-8')
+    istream = repo.odb.store(IStream('blob', len(data), BytesIO(data)))
+    return BaseIndexEntry((entry.mode, istream.binsha, 0, entry.path))
+
+# Read one staged blob and return its sanitized text, or None when it is binary or has no secrets.
+# Runs serially on purpose: the blob reads share GitPython's single `git cat-file --batch` pipe,
+# which is not thread-safe, and the regex pass holds the GIL, so a thread pool would gain nothing
+# When texts_out is given, the text the regex pass leaves behind (sanitized or not) is kept there
+# for the LLM pass, so the blob isn't read a second time
+def _sanitize_staged_entry(repo: Repo, entry: BaseIndexEntry, texts_out: Optional[Dict[str, str]] = None) -> Optional[str]:
+    # Read the staged blob content
+    data = _read_staged_blob(repo, entry)
+    if data is None:
+        return None
 
-# Return the blob mode for the index entry
-def _blob_mode_from_index(repo: Repo, path: str) -> str:
-    entry = repo.index.entries.get((path, 0))
+    # The LLM pass looks at every text file, so collecting means decoding up front
+    text = None
+    if texts_out is not None:
+        text = _decode_text(data)
+        if text is None:
+            return None
+        texts_out[entry.path] = text
+        
+    # Skip the regex pass when none of the pattern anchors appear
+    if not _may_contain_secret(data):
+        return None
     
-    if entry:
-        return f'{entry.mode:06o}'
+    # Only process textish files
+    if text is None:
+        text = _decode_text(data)
+        if text is None:
+            return None
     
-    # Default to regular file if missing
-    return '100644'
+    sanitized, changed = _sanitize_text(text)
+    if not changed:
+        return None
+    if texts_out is not None:
+        texts_out[entry.path] = sanitized
+    return sanitized
 
 # Scan staged files for any secrets, and if there is a secret replaec it with 'api_key' in the index only
-def sanitize_staged_secrets_in_index(repo: Repo) -> List[Dict[str, Any]]:
+def sanitize_staged_secrets_in_index(repo: Repo, texts_out: Optional[Dict[str, str]] = None, staged: Optional[StagedManifest] = None) -> List[Dict[str, Any]]:
     modified: List[Dict[str, Any]] = []
     
     # Get list of staged paths (name only)
-    try: 
-        staged_paths = repo.git.diff('--name-only', '--cached').splitlines()
-        staged_paths = [str(p) for p in staged_paths]
-    except:
-        # Initial commit: Use index for entries
-        staged_paths = [str(p) for (p, _) in repo.index.entries.keys()]
+    if staged is not None:
+        staged_paths = [p for _, p in staged]
+    else:
+        try: 
+            staged_paths = repo.git.diff('--name-only', '--cached').splitlines()
+            staged_paths = [str(p) for p in staged_paths]
+        except:
+            # Initial commit: Use index for entries
+            staged_paths = [str(p) for (p, _) in repo.index.entries.keys()]
         
-    root = Path(repo.working_tree_dir or '.')
-    cwd_str = str(root)
+    index = repo.index
+    new_entries: List[BaseIndexEntry] = []
     
     for path in staged_paths:
         path_str = str(path)
         
         # Skip files that are being deleted. Ensure file is in index
-        if (path_str, 0) not in repo.index.entries:
+        entry = index.entries.get((path_str, 0))
+        if entry is None:
             continue
         
-        # Read the staged blob content
-        try:
-            raw = repo.git.show(f':{path_str}')
-            data = raw.encode('utf-8', errors='ignore')
-        except:
-            # Fall back to working tree if show fails
-            wt = (root / path_str)
-            
-            if not wt.exists() or not wt.is_file():
-                continue
-            
-            data = wt.read_bytes()
-            
-        # Only process textish files
-        if not _is_probably_text(data):
-            continue
-        
-        text = data.decode('utf-8', errors='replace')
-        sanitized, changed = _sanitize_text(text)
-        
         # Skip if nothing changed
-        if not changed:
+        sanitized = _sanitize_staged_entry(repo, entry, texts_out)
+        if sanitized is None:
             continue
         
-        # Modify the index to remove api keys
-        # 1) git hash-object -w --stdin -> returns blob id
-        p1 = subprocess.run(
-            ['git', 'hash-object', '-w', '--stdin'],
-            cwd=cwd_str,
-            input=sanitized.encode('utf-8'),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        
-        if p1.returncode != 0:
+        # Write the sanitized blob now, the index entries are updated together below
+        try:
+            new_entries.append(_store_staged_blob(repo, entry, sanitized))
+        except Exception:
             continue
         
-        blob_id = p1.stdout.decode().strip()
-        
-        # 2) git update-index --cacheinfo <mode> <blob> <path>
-        mode = api_key(repo, path_str)
-        p2 = subprocess.run(
-            ['git', 'update-index', '--cacheinfo', mode, blob_id, path_str],
-            cwd=cwd_str,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        
-        if p2.returncode == 0:
-            modified.append({'path': path_str, 'replaced': True})
+        modified.append({'path': path_str, 'replaced': True})
+    
+    # Point every sanitized path at its new blob with a single index write
+    if new_entries:
+        try:
+            index.add(new_entries, write=True)
+        except Exception:
+            return []
             
     return modified
 
-def llm_scan_staged_secrets_in_index(repo: Repo, max_chars_per_call: int = 60000) -> list[dict]:
+# Whether a Gemini error says the request was too big (payload size or token limit)
+def _is_request_too_large(e: Exception) -> bool:
+    code = getattr(e, "code", None)
+    if code == 413:
+        return True
+    if code != 400:
+        return False
+    msg = str(e).lower()
+    return any(k in msg for k in ("too large", "exceeds", "payload size", "token count", "too many tokens"))
+
+# staged_texts ({path: text}, from sanitize_staged_secrets_in_index) skips reading the blobs again
+def llm_scan_staged_secrets_in_index(repo: Repo, max_chars_per_call: int = 60000, max_concurrency: int = 8, staged_texts: Optional[Dict[str, str]] = None) -> list[dict]:
     LLM_PROMPT_PREAMBLE = """You are a precise code auditor.
-Given a file CHUNK, identify any secrets that look like API keys, tokens, client secrets, or credentials.
+You are given one or more file CHUNKS. Each chunk starts with a line "=== CHUNK <id> ===" and ends with a line "=== END CHUNK <id> ===".
+Identify any secrets that look like API keys, tokens, client secrets, or credentials.
 Return ONLY JSON with this schema (no extra text):
 
 {
   "findings": [
     {
-      "start": <integer char offset in the PROVIDED CHUNK>,
-      "end": <integer char offset in the PROVIDED CHUNK>,
+      "id": <integer id of the CHUNK the finding is in>,
+      "start": <integer char offset in that CHUNK>,
+      "end": <integer char offset in that CHUNK>,
       "kind": "<short label, e.g. 'token'|'api_key'|'client_secret'>",
       "reason": "<why this looks sensitive>",
       "snippet": "<the exact substring you flagged>"
@@ -240,33 +376,29 @@ Return ONLY JSON with this schema (no extra text):
 }
 
 Rules:
-- Offsets are character indices in the CHUNK you are given, not the whole file.
+- Offsets are character indices in the text between the CHUNK markers, not the whole file.
+- Every finding must carry the id of the chunk it was found in.
 - Only include items you are at least 60% confident are secrets.
 - Prefer values (right-hand side of = or :) rather than keys.
 - Avoid false positives like URLs without tokens, comments about keys, or placeholders.
 - If nothing is found, return {"findings": []}.
 """
 
-    def _chunk_text(s: str, max_chars: int = 60000, overlap: int = 200) -> list[tuple[int, str]]:
-        """Yield (offset, chunk). Offsets are start positions in the full string."""
-        if len(s) <= max_chars:
-            return [(0, s)]
-        out, i, n = [], 0, len(s)
-        while i < n:
+    def _chunk_spans(n: int, max_chars: int = 60000, overlap: int = 200) -> Iterator[tuple[int, int]]:
+        """Yield (offset, length) of each chunk of an n-char text; the text itself is not copied."""
+        # An overlap close to max_chars would advance only a few chars per chunk
+        overlap = min(overlap, max_chars // 2)
+        i = 0
+        while True:
             j = min(i + max_chars, n)
-            out.append((i, s[i:j]))
-            if j == n:
+            yield i, j - i
+            if j >= n:
                 break
-            i = max(0, j - overlap)
-        return out
+            i = max(i + 1, j - overlap)
 
-    def _apply_replacements_by_ranges(text: str, ranges: list[tuple[int, int]], replacement: str = "api_key") -> str:
-        """Apply [start,end) replacements descending by start so indices remain valid."""
-        out = text
-        for (start, end) in sorted(ranges, key=lambda r: r[0], reverse=True):
-            if 0 <= start < end <= len(out):
-                out = out[:start] + replacement + out[end:]
-        return out
+    def _chunk(cid: int) -> str:
+        path_str, base, length = chunks[cid]
+        return texts[path_str][base:base + length]
 
     def _extract_findings_from_response(resp_text: str) -> list[dict]:
         try:
@@ -277,155 +409,211 @@ Rules:
         out = []
         for it in items:
             try:
+                cid = int(it["id"])
                 start = int(it["start"]); end = int(it["end"])
                 kind = str(it.get("kind", "secret"))
                 reason = str(it.get("reason", ""))
                 snippet = str(it.get("snippet", ""))
-                out.append({"start": start, "end": end, "kind": kind, "reason": reason, "snippet": snippet})
+                out.append({"id": cid, "start": start, "end": end, "kind": kind, "reason": reason, "snippet": snippet})
             except Exception:
                 continue
         return out
 
+    def _pack_batches(chunks: list[tuple[str, int, int]]) -> list[list[int]]:
+        """Group chunk ids into batches of at most max_chars_per_call characters."""
+        batches, current, size = [], [], 0
+        for cid, (_, _, length) in enumerate(chunks):
+            if current and size + length > max_chars_per_call:
+                batches.append(current)
+                current, size = [], 0
+            current.append(cid)
+            size += length
+        if current:
+            batches.append(current)
+        return batches
+
+    def _scan_batch(ids: list[int]) -> list[dict]:
+        """One Gemini call for every chunk in the batch; halves the batch and retries if it was too large."""
+        body = "\n".join(
+            f"=== CHUNK {cid} ===\n{_chunk(cid)}\n=== END CHUNK {cid} ===" for cid in ids
+        )
+        try:
+            resp = client.models.generate_content(
+                model=model,
+                contents=[
+                    {
+                        "role":"user",
+                        "parts": [
+                            { "text": LLM_PROMPT_PREAMBLE },
+                            { "text": body }
+                        ]
+                    }
+                ],
+                # TODO: Maybe remove?
+                config={
+                    "response_mime_type": "application/json"
+                }
+            )
+        except Exception as e:
+            # Only a request that is too large gets smaller by splitting. Quota, auth and
+            # network errors would just fail again, once per half
+            if len(ids) > 1 and _is_request_too_large(e):
+                mid = len(ids) // 2
+                return _scan_batch(ids[:mid]) + _scan_batch(ids[mid:])
+            for cid in ids:
+                notes_by_path.setdefault(chunks[cid][0], []).append(f"LLM error on chunk: {e}")
+            return []
+
+        resp_text = getattr(resp, "text", "") or ""
+        batch_ids = set(ids)
+        return [f for f in _extract_findings_from_response(resp_text) if f["id"] in batch_ids]
+
     results: list[dict] = []
 
     # Get staged paths
-    try:
-        staged_paths = repo.git.diff('--name-only', '--cached').splitlines()
-    except:
-        staged_paths = [str(p) for (p, _) in repo.index.entries.keys()]
+    if staged_texts is not None:
+        staged_paths = list(staged_texts)
+    else:
+        try:
+            staged_paths = repo.git.diff('--name-only', '--cached').splitlines()
+        except:
+            staged_paths = [str(p) for (p, _) in repo.index.entries.keys()]
 
     if not staged_paths:
         return results
 
-    root = Path(repo.working_tree_dir or '.')
-    cwd_str = str(root)
-    client = genai.Client(api_key=api_key)
+    index = repo.index
+    _api_key, model = _gemini_settings()
+    client = _genai_client()
+
+    # (path, base offset in file, length) for every chunk of every text file; the chunk
+    # text is only sliced out of texts[path] while its request body is being built
+    chunks: list[tuple[str, int, int]] = []
+    texts: dict[str, str] = {}
+    ranges_by_path: dict[str, list[tuple[int, int]]] = {}
+    notes_by_path: dict[str, list[str]] = {}
 
-    for path_str in tqdm(staged_paths, desc='Sanatizing changed files', unit=' File'):
+    for path_str in staged_paths:
         # Skip deletions or not in index
-        if (path_str, 0) not in repo.index.entries:
+        entry = index.entries.get((path_str, 0))
+        if entry is None:
             continue
 
-        # Read staged blob
-        try:
-            raw = repo.git.show(f':{path_str}')
-            data = raw.encode('utf-8', errors='ignore')
-        except:
-            wt = (root / path_str)
-
-            if not wt.exists() or not wt.is_file():
+        if staged_texts is not None:
+            text = staged_texts[path_str]
+        else:
+            # Read staged blob
+            data = _read_staged_blob(repo, entry)
+            if data is None:
                 continue
 
-            data = wt.read_bytes()
-
-        # Only process text files
-        if not _is_probably_text(data):
-            continue
-
-        text = data.decode('utf-8', errors='replace')
-        chunks = _chunk_text(text, max_chars=api_key, overlap=200)
-
-        all_ranges: list[tuple[int, int]] = []
-        notes: list[str] = []
+            # Only process text files
+            text = _decode_text(data)
+            if text is None:
+                continue
 
-        for base, chunk in chunks:
-            try:
-                resp = client.models.generate_content(
-                    model=model,
-                    contents=[
-                        {
-                            "role":"user",
-                            "parts": [
-                                { "text": LLM_PROMPT_PREAMBLE },
-                                { "text": f"CHUNK:\n{chunk}"}
-                            ]
-                        }
-                    ],
-                    # TODO: Maybe remove?
-                    config={
-                        "response_mime_type": "application/json"
-                    }
+        texts[path_str] = text
+
+        for base, length in _chunk_spans(len(text), max_chars=max_chars_per_call, overlap=200):
+            chunks.append((path_str, base, length))
+
+    # Batches are independent, so keep up to max_concurrency requests in flight
+    batches = _pack_batches(chunks)
+    findings: list[dict] = []
+    if batches:
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(batches))) as ex:
+            futures = [ex.submit(_scan_batch, ids) for ids in batches]
+            for fut in tqdm(as_completed(futures), total=len(futures), desc='Sanatizing changed files', unit=' Batch'):
+                findings.extend(fut.result())
+
+    # Map chunk offsets
+    for f in findings:
+        path_str, base, length = chunks[f['id']]
+        text = texts[path_str]
+        # Offsets are converted to file offsets right away and checked against the chunk bounds
+        s, e = base + f['start'], base + f['end']
+
+        if base <= s < e <= base + length:
+            candidate = text[s:e]
+
+            # If snippet provided but not aligned, attempt loose locate
+            snip = f.get("snippet") or ""
+            if snip and snip not in candidate:
+                idx = text.find(snip, base, base + length)
+
+                if idx != -1:
+                    s, e = idx, idx + len(snip)
+                    candidate = text[s:e]
+
+            if len(candidate.strip()) >= 8:  # avoid trivial strings
+                ranges_by_path.setdefault(path_str, []).append((s, e))
+                notes_by_path.setdefault(path_str, []).append(
+                    f"{path_str}: {f.get('kind','secret')} → {f.get('reason','')}"
                 )
 
-                resp_text = getattr(resp, "text", "") or ""
-                findings = api_key(resp_text)
-
-                # Map chunk offsets
-                for f in tqdm(findings, desc='Sanatizing findings', unit=' Finding'):
-                    s, e = f['start'], f['end']
-
-                    if 0 <= s < e < len(chunk):
-                        candidate = chunk[s:e]
+    new_entries: list[BaseIndexEntry] = []
+    pending: list[dict] = []
 
-                        # If snippet provided but not aligned, attempt loose locate
-                        snip = f.get("snippet") or ""
-                        if snip and snip not in candidate:
-                            idx = chunk.find(snip)
+    for path_str, all_ranges in ranges_by_path.items():
+        text = texts[path_str]
+        notes = notes_by_path.get(path_str, [])
 
-                            if idx != -1:
-                                s, e = idx, idx + len(snip)
-                                candidate = chunk[s:e]
-
-                        if len(candidate.strip()) >= 8:  # avoid trivial strings
-                            all_ranges.append((base + s, base + e))
-                            notes.append(
-                                f"{path_str}: {f.get('kind','secret')} → {f.get('reason','')}"
-                            )
-            except Exception as e:
-                notes.append(f"LLM error on chunk: {e}")
-
-        if not all_ranges:
-            continue
+        # Findings from the overlap of two chunks show up twice; count each masked range once
+        merged = _merge_ranges(all_ranges, len(text))
 
         # TODO: Remove LLM part, left in for testing
-        new_text = api_key(text, all_ranges, replacement='api_key_llm')
+        new_text = _apply_replacements_by_ranges(text, merged, replacement='api_key_llm')
 
         # Make sure text was changed
         if new_text == text:
             continue
 
-        p1 = subprocess.run(
-            ['git', 'hash-object', '-w', '--stdin'],
-            cwd=cwd_str,
-            input=new_text.encode('utf-8'),
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-
-        if p1.returncode != 0:
-            results.append({ "path": path_str, "replaced_count": 0, "notes": notes + ['hash-object failed']})
+        try:
+            new_entries.append(_store_staged_blob(repo, index.entries[(path_str, 0)], new_text))
+        except Exception as e:
+            results.append({"path": path_str, "replaced_count": 0, "notes": notes + [f"index update failed: {e}"]})
             continue
 
-        blob_id = p1.stdout.decode().strip()
-        mode = api_key(repo, path_str)
-
-        p2 = subprocess.run(
-            ['git', 'update-index', '--cacheinfo', mode, blob_id, path_str],
-            cwd=cwd_str,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+        pending.append(
+            {"path": path_str, "replaced_count": len(merged), "notes": notes}
         )
 
-        if p2.returncode == 0:
-            results.append(
-                {"path": path_str, "replaced_count": len(all_ranges), "notes": notes}
-            )
-        else:
-            results.append(
-                {
-                    "path": path_str,
-                    "replaced_count": 0,
-                    "notes": notes + ["update-index failed"],
-                }
-            )
+    # One index write for all rewritten paths
+    if new_entries:
+        try:
+            index.add(new_entries, write=True)
+        except Exception as e:
+            pending = [
+                {"path": r["path"], "replaced_count": 0, "notes": r["notes"] + [f"index update failed: {e}"]}
+                for r in pending
+            ]
+        results.extend(pending)
 
     return results
 
+# Regex pass then LLM pass over the staged files, reading each staged blob once
+def scan_staged_for_secrets(repo: Repo, staged: Optional[StagedManifest] = None) -> Tuple[List[Dict[str, Any]], list[dict]]:
+    texts: Dict[str, str] = {}
+    sanitized = sanitize_staged_secrets_in_index(repo, texts_out=texts, staged=staged)
+    llm_results = llm_scan_staged_secrets_in_index(repo, staged_texts=texts)
+    return sanitized, llm_results
+
 def _read_small_file(path: Path, limit: int = 40_000) -> str:
+    # One stat decides both "is it a file" and the cache key, so unchanged files are not re-read
+    try:
+        st = os.stat(path)
+    except OSError:
+        return ""
+    if not stat.S_ISREG(st.st_mode):
+        return ""
+    return _read_small_file_cached(str(path), st.st_mtime_ns, st.st_size, limit)
+
+
+@lru_cache(maxsize=256)
+def _read_small_file_cached(path_str: str, mtime_ns: int, size: int, limit: int) -> str:
     try:
-        if not path.exists() or not path.is_file():
-            return ""
-        data = path.read_bytes()
+        with open(path_str, "rb") as f:
+            data = f.read(limit + 1)
         if len(data) > limit:
             return data[:limit].decode("utf-8", errors="replace") + "\n\n[TRUNCATED]"
         return data.decode("utf-8", errors="replace")
@@ -433,21 +621,35 @@ def _read_small_file(path: Path, limit: int = 40_000) -> str:
         return ""
 
 
-def _primary_language(repo_root: Path) -> str:
+# Directories that never say anything about the project's own language
+_LANG_SKIP_DIRS = frozenset({"node_modules", "venv", "__pycache__"})
+
+
+@lru_cache(maxsize=8)
+def _primary_language(root_str: str, head_sha: Optional[str]) -> str:
+    # head_sha is only part of the cache key: the result is reused until HEAD moves
     exts = {}
-    # scan lightly to keep things fast
-    for p in repo_root.rglob("*"):
+    stack = [root_str]
+    while stack:
         try:
-            if (
-                p.is_file()
-                and not p.name.startswith(".")
-                and p.stat().st_size < 2_000_000
-            ):
-                ext = p.suffix.lower()
-                if ext:
-                    exts[ext] = exts.get(ext, 0) + 1
-        except Exception:
+            it = os.scandir(stack.pop())
+        except OSError:
             continue
+        with it:
+            for e in it:
+                # dot entries cover .git, .venv and editor/tooling folders
+                if e.name.startswith("."):
+                    continue
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        if e.name not in _LANG_SKIP_DIRS:
+                            stack.append(e.path)
+                    elif e.is_file(follow_symlinks=False):
+                        ext = os.path.splitext(e.name)[1].lower()
+                        if ext:
+                            exts[ext] = exts.get(ext, 0) + 1
+                except OSError:
+                    continue
     if not exts:
         return "unknown"
     ext = max(exts.items(), key=lambda kv: kv[1])[0]
@@ -467,28 +669,41 @@ def _primary_language(repo_root: Path) -> str:
 
 
 def _staged_name_status(repo: Repo) -> list[tuple[str, str]]:
-    out = []
+    # HEAD -> index diff; parsed from git's -z raw output, so renames and odd paths come out whole
     try:
-        lines = repo.git.diff("--cached", "--name-status").splitlines()
-        for ln in lines:
-            parts = ln.split("\t", 1)
-            if len(parts) == 2:
-                out.append((parts[0].strip(), parts[1].strip()))
-    except Exception:
-        pass
-    return out
+        diffs = repo.head.commit.diff()
+    except (ValueError, GitCommandError):
+        # Initial commit (or git can't diff HEAD): treat everything in the index as new,
+        # same fallback as anything_staged
+        return [("A", p) for (p, _) in repo.index.entries.keys()]
+    return [(d.change_type, d.b_path or d.a_path) for d in diffs]
+
+
+# The staged changes as (status, path) pairs, listed once by auto_commit and handed to every
+# helper below that takes `staged`, instead of each one diffing HEAD against the index again
+def staged_manifest(repo: Repo) -> StagedManifest:
+    return tuple(_staged_name_status(repo))
 
 
 def _staged_patch(repo: Repo, max_chars: int = 80_000) -> str:
+    # Read at most max_chars + 1 bytes and stop git there instead of buffering the whole patch
     try:
-        patch = repo.git.diff("--cached", "-U2")
-        return (
-            patch
-            if len(patch) <= max_chars
-            else patch[:max_chars] + "\n\n[PATCH TRUNCATED]"
-        )
+        p = repo.git.diff("--cached", "-U2", as_process=True)
     except Exception:
         return ""
+    try:
+        data = p.stdout.read(max_chars + 1)
+    except Exception:
+        data = b""
+    finally:
+        p.stdout.close()
+        if p.proc.poll() is None:
+            p.proc.kill()
+        # Wait on the raw Popen: AutoInterrupt.wait() raises on the kill's exit status
+        p.proc.wait()
+
+    patch = data[:max_chars].decode("utf-8", errors="replace")
+    return patch if len(data) <= max_chars else patch + "\n\n[PATCH TRUNCATED]"
 
 
 def _collect_nearby_context(
@@ -521,14 +736,15 @@ def _collect_nearby_context(
     ]
     for name in root_hints:
         p = root / name
-        if p.exists() and p.is_file():
+        if os.path.isfile(p):
             ctx[name] = _read_small_file(p)
             seen.add(p)
         if len(ctx) >= 6:  # keep it lean
             break
 
-    # Nearby hints for each staged file (parent config/build files)
-    neighbor_names = {
+    # Nearby hints for each staged file (parent config/build files). A tuple keeps the
+    # probe order, and with it the collected context, stable between runs
+    neighbor_names = (
         "Makefile",
         "pyproject.toml",
         "requirements.txt",
@@ -541,12 +757,13 @@ def _collect_nearby_context(
         ".pre-commit-config.yaml",
         ".flake8",
         ".editorconfig",
-    }
-    for path_str in staged_paths:
-        pp = (root / path_str).parent
+    )
+    # Staged files mostly share a few directories, so probe each directory only once
+    parents = dict.fromkeys((root / path_str).parent for path_str in staged_paths)
+    for pp in parents:
         for cand in neighbor_names:
             p = pp / cand
-            if p.exists() and p.is_file() and p not in seen:
+            if p not in seen and os.path.isfile(p):
                 rel = str(p.relative_to(root))
                 ctx[rel] = _read_small_file(p)
                 seen.add(p)
@@ -564,15 +781,57 @@ def collect_project_context_dynamic(repo: Repo, staged_paths: list[str]) -> dict
     except Exception:
         pass
 
+    try:
+        head_sha = repo.head.commit.hexsha
+    except ValueError:
+        # no commits yet
+        head_sha = None
+
     ctx = {
         "repo_name": root.name,
         "branch": branch,
-        "primary_language": _primary_language(root),
+        "primary_language": _primary_language(str(root), head_sha),
         "nearby_context": _collect_nearby_context(root, staged_paths),
     }
     return ctx
 
 
+# Project context for generate_commit_message, safe to run on another thread while `repo` is in
+# use (e.g. by the LLM secret scan). It opens its own Repo: GitPython's object database talks to
+# long-lived git processes that can't be shared between threads. Only the working tree and refs
+# are read, which the scan doesn't change
+def collect_commit_context(repo_dir: str, staged: Optional[StagedManifest] = None) -> dict:
+    with Repo(repo_dir) as repo:
+        staged_paths = [p for _, p in (staged if staged is not None else _staged_name_status(repo))]
+        return collect_project_context_dynamic(repo, staged_paths)
+
+
+# Static instructions for generate_commit_message. They go in the system instruction so every
+# request starts with the same prefix (eligible for Gemini's implicit prompt caching) and only
+# the per-commit context is sent as user content.
+COMMIT_MSG_SYSTEM = textwrap.dedent(
+    """\
+You are a commit message generator that writes clear messages following Conventional Commits.
+Output plain text ONLY: a subject line (<=72 chars), optional blank line, and a short body.
+If secrets were sanitized, use type "chore" with scope "(security)" and mention it in the body.
+Use present tense and imperative mood (e.g., "sanitize", "add", "fix").
+Avoid code fences, markdown headers, or JSON in the output.
+"""
+)
+
+COMMIT_MSG_RULES = textwrap.dedent(
+    """\
+Guidelines:
+- Subject: format: type(scope): description (e.g., "feat(ui): add dark mode").
+- Summarize WHAT changed and WHY in 1-5 short lines in the body.
+- Refer to files or modules only when helpful; avoid noisy path lists.
+- If secrets were removed/masked, mention the count of affected files.
+- No trailers unless needed for BREAKING CHANGE.
+- Do not format anything, everything should be in plain, natural english. Do not use markdown formatting.
+"""
+)
+
+
 def _fallback_commit_message(
     staged: list[tuple[str, str]], sanitized: list[dict], llm_results: list[dict]
 ) -> str:
@@ -594,23 +853,97 @@ def _fallback_commit_message(
     return subject + "\n\n" + "\n".join(body)
 
 
+# Generated commit messages are kept on disk for a day, keyed by what was sent to Gemini,
+# so committing the same staged changes again (amend/rebase loops, a retried push) skips the call
+COMMIT_MSG_CACHE_DIR = Path.home() / ".vibe-wrapper" / "msgcache"
+COMMIT_MSG_CACHE_TTL = 24 * 60 * 60  # seconds
+
+
+def _commit_msg_cache_key(repo: Repo, sanitized: list[dict], llm_results: list[dict], ctx: dict, max_ctx_chars: int) -> Optional[str]:
+    # HEAD plus the tree the index would commit pin the staged diff exactly, ctx covers the
+    # branch, language and nearby files, and the secret results are reduced to the paths and
+    # counts the prompt is built from
+    try:
+        head = repo.head.commit.hexsha
+    except (ValueError, GitCommandError):
+        head = ""
+    try:
+        tree = repo.git.write_tree()
+    except GitCommandError:
+        return None
+    _api_key, model = _gemini_settings()
+    payload = json.dumps([
+        head,
+        tree,
+        model,
+        max_ctx_chars,
+        ctx,
+        sorted({d["path"] for d in sanitized}),
+        sorted((r["path"], int(r.get("replaced_count", 0))) for r in llm_results if "path" in r),
+    ], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _cached_commit_message(key: str) -> Optional[str]:
+    path = COMMIT_MSG_CACHE_DIR / f"{key}.txt"
+    try:
+        if time.time() - path.stat().st_mtime >= COMMIT_MSG_CACHE_TTL:
+            return None
+        return path.read_text(encoding="utf-8") or None
+    except OSError:
+        return None
+
+
+def _store_commit_message(key: str, msg: str) -> None:
+    # Written to a temp file and renamed, so a reader never sees half a message
+    try:
+        COMMIT_MSG_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Expired entries would never be read again, so drop them while we're here
+        cutoff = time.time() - COMMIT_MSG_CACHE_TTL
+        for old in COMMIT_MSG_CACHE_DIR.iterdir():
+            try:
+                if old.stat().st_mtime < cutoff:
+                    old.unlink()
+            except OSError:
+                continue
+        tmp = COMMIT_MSG_CACHE_DIR / f"{key}.{os.getpid()}.tmp"
+        tmp.write_text(msg, encoding="utf-8")
+        os.replace(tmp, COMMIT_MSG_CACHE_DIR / f"{key}.txt")
+    except OSError:
+        pass
+
+
 def generate_commit_message(
     repo: Repo,
     sanitized: list[dict] | None,
     llm_results: list[dict] | None,
     max_ctx_chars: int = 110_000,
+    ctx: dict | None = None,
+    staged: StagedManifest | None = None,
 ) -> str:
     """
     Build a Conventional Commits-style message with dynamic repo context.
-    Uses module-level `api_key` and `model` variables (already loaded from config).
+    Uses the Gemini key and model from config.json.
+    `ctx` is a context already collected by collect_commit_context, else it is collected here.
+    `staged` is the manifest from staged_manifest, else the staged changes are listed here.
     Falls back to a deterministic message if the model fails.
+    Messages from the model are cached on disk, keyed by everything the prompt is built from.
     """
-    staged = api_key(repo)
+    if staged is None:
+        staged = _staged_name_status(repo)
     if not staged:
         return "chore: no-op (nothing staged)"
 
-    staged_paths = [p for _, p in staged]
-    ctx = api_key(repo, staged_paths)
+    if ctx is None:
+        staged_paths = [p for _, p in staged]
+        ctx = collect_project_context_dynamic(repo, staged_paths)
+
+    cache_key = _commit_msg_cache_key(repo, sanitized or [], llm_results or [], ctx, max_ctx_chars)
+    if cache_key:
+        cached = _cached_commit_message(cache_key)
+        if cached:
+            log.info('Reusing cached commit message')
+            return cached
     patch = _staged_patch(repo, max_chars=min(80_000, max_ctx_chars))
 
     # Compact context blob
@@ -618,7 +951,6 @@ def generate_commit_message(
         "repo_name": ctx["repo_name"],
         "branch": ctx["branch"],
         "primary_language": ctx["primary_language"],
-        "staged": staged[:400],
         "sanitized_paths": sorted({d["path"] for d in (sanitized or [])}),
         "llm_sanitized": [
             {"path": r["path"], "count": int(r.get("replaced_count", 0))}
@@ -628,52 +960,36 @@ def generate_commit_message(
         "context_files": ctx["nearby_context"],  # the LLM decides importance
     }
 
-    SYSTEM = textwrap.dedent(
-        """\
-    You are a commit message generator that writes clear messages following Conventional Commits.
-    Output plain text ONLY: a subject line (<=72 chars), optional blank line, and a short body.
-    If secrets were sanitized, use type "chore" with scope "(security)" and mention it in the body.
-    Use present tense and imperative mood (e.g., "sanitize", "add", "fix").
-    Avoid code fences, markdown headers, or JSON in the output.
-    """
-    )
-
-    RULES = textwrap.dedent(
-        """\
-    Guidelines:
-    - Subject: format: type(scope): description (e.g., "feat(ui): add dark mode").
-    - Summarize WHAT changed and WHY in 1-5 short lines in the body.
-    - Refer to files or modules only when helpful; avoid noisy path lists.
-    - If secrets were removed/masked, mention the count of affected files.
-    - No trailers unless needed for BREAKING CHANGE.
-    - Do not format anything, everything should be in plain, natural english. Do not use markdown formatting.
-    """
-    )
+    # Serialize each part exactly once, then cap it
+    ctx_json = json.dumps(ctx_blob, ensure_ascii=False)[: max_ctx_chars // 2]
+    staged_json = json.dumps(staged[:400], ensure_ascii=False)[: max_ctx_chars // 4]
 
     USER = textwrap.dedent(
         f"""\
     Project context (auto-collected from staged files and nearby configs):
-    {json.dumps({k:v for k,v in ctx_blob.items() if k != "staged"}, ensure_ascii=False)[:max_ctx_chars//2]}
+    {ctx_json}
 
     Staged changes (name-status):
-    {json.dumps(ctx_blob["staged"], ensure_ascii=False)[:max_ctx_chars//4]}
+    {staged_json}
 
     Unified diff (may be truncated):
     {patch}
 
-    {RULES}
     Write the commit message now.
     """
     )
 
     try:
-        client = genai.Client(api_key=api_key)  # uses module-level api_key
+        _api_key, model = _gemini_settings()
+        client = _genai_client()
         resp = client.models.generate_content(
-            model=model,  # uses module-level model
+            model=model,
             contents=[
-                {"role": "user", "parts": [{"text": SYSTEM}]},
                 {"role": "user", "parts": [{"text": USER}]},
             ],
+            config={
+                "system_instruction": COMMIT_MSG_SYSTEM + "\n" + COMMIT_MSG_RULES
+            },
         )
         msg = (getattr(resp, "text", None) or "").strip()
         if not msg:
@@ -691,7 +1007,24 @@ def generate_commit_message(
         normalized = "\n".join(
             [lines[0]] + ([] if len(lines) == 1 or lines[1] == "" else [""]) + lines[1:]
         )
+        if cache_key:
+            _store_commit_message(cache_key, normalized)
         return normalized
     except Exception as e:
-        print(f'\n==========\nEXCEPTION: {str(e)}\n==========\n')
-        return _fallback_commit_message(staged, sanitized or [], llm_results or [])
\ No newline at end of file
+        log.error(f'Commit message generation failed, using the fallback: {e}')
+        return _fallback_commit_message(staged, sanitized or [], llm_results or [])
+
+
+if __name__ == "__main__":
+    # Sanitizer regression checks
+    cases = [
+        # A key right after a masked value and '.' must still be found
+        (
+            "user=AAAAAAAAAAAAAAAAAAAAAA.password=BBBBBBBBBBBBBBBBBBBBBBBB",
+            "user=api_key.password=api_key",
+        ),
+    ]
+    for text, expected in cases:
+        got, _ = _sanitize_text(text)
+        assert got == expected, f"{text!r}: got {got!r}, expected {expected!r}"
+    print(f"{len(cases)} sanitizer case(s) OK")
@@ -1,110 +1,43 @@
 # actions/focus_mode.py
 import subprocess
 import json
-from typing import Dict, Any
+import platform
+import shutil
+import threading
+from functools import lru_cache
+from typing import Dict, Any, Optional
 
 def toggle_do_not_disturb(enable: bool = True) -> Dict[str, Any]:
     """Toggle Do Not Disturb mode on macOS using multiple approaches"""
-    try:
-        # Method 1: Try using osascript with simpler approach
-        if enable:
-            script = '''
-            tell application "System Events"
-                set dndEnabled to do shell script "defaults -currentHost read com.apple.notificationcenterui dndStart 2>/dev/null || echo 'disabled'"
-                if dndEnabled is "disabled" then
-                    do shell script "defaults -currentHost write com.apple.notificationcenterui dndStart -1 && killall NotificationCenter"
-                    return "enabled"
-                else
-                    return "already enabled"
-                end if
-            end tell
-            '''
-        else:
-            script = '''
-            tell application "System Events"
-                set dndEnabled to do shell script "defaults -currentHost read com.apple.notificationcenterui dndStart 2>/dev/null || echo 'disabled'"
-                if dndEnabled is not "disabled" then
-                    do shell script "defaults -currentHost delete com.apple.notificationcenterui dndStart && killall NotificationCenter"
-                    return "disabled"
-                else
-                    return "already disabled"
-                end if
-            end tell
-            '''
-
-        # Try the osascript approach first
-        result = subprocess.run(
-            ["osascript", "-e", script],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
+    # Big Sur (11) moved Do Not Disturb into Focus and the dndStart key no longer does anything,
+    # so there the defaults tier is skipped and the fallback (shortcuts first) runs directly
+    if _macos_major() >= 11:
+        return toggle_do_not_disturb_fallback(enable)
 
-        if result.returncode == 0:
-            response = result.stdout.strip()
-            if "enabled" in response:
-                return {
-                    "ok": True,
-                    "message": f"Do Not Disturb mode enabled",
-                    "status": "enabled",
-                    "enabled": True
-                }
-            elif "disabled" in response:
-                return {
-                    "ok": True,
-                    "message": f"Do Not Disturb mode disabled",
-                    "status": "disabled",
-                    "enabled": False
-                }
-
-        # Method 2: Try direct defaults command approach
-        return toggle_do_not_disturb_direct(enable)
-
-    except subprocess.TimeoutExpired:
-        return {
-            "ok": False,
-            "error": "Do Not Disturb toggle timed out",
-            "enabled": enable
-        }
-    except Exception as e:
-        return {
-            "ok": False,
-            "error": f"Failed to toggle Do Not Disturb: {str(e)}",
-            "enabled": enable
-        }
+    # Method 1: direct defaults command, falls through to shortcuts/m-cli/manual on failure.
+    # No osascript tier: it only wrapped these same defaults/killall calls in `do shell script`
+    return toggle_do_not_disturb_direct(enable)
 
 def toggle_do_not_disturb_direct(enable: bool = True) -> Dict[str, Any]:
     """Direct approach using defaults command"""
     try:
         if enable:
             # Turn on Do Not Disturb using defaults
-            cmd = [
-                "defaults", "-currentHost", "write", "com.apple.notificationcenterui",
-                "dndStart", "-1"
-            ]
+            cmd = "defaults -currentHost write com.apple.notificationcenterui dndStart -1"
         else:
             # Turn off Do Not Disturb
-            cmd = [
-                "defaults", "-currentHost", "delete", "com.apple.notificationcenterui",
-                "dndStart"
-            ]
+            cmd = "defaults -currentHost delete com.apple.notificationcenterui dndStart"
 
-        # Execute the command
+        # Execute the command, then kill the NotificationCenter process to apply changes.
+        # One shell runs both; the exit status is the defaults one, killall's is ignored
         result = subprocess.run(
-            cmd,
+            ["/bin/sh", "-c", cmd + " && { killall NotificationCenter >/dev/null 2>&1; true; }"],
             capture_output=True,
             text=True,
             timeout=10
         )
 
         if result.returncode == 0:
-            # Kill the NotificationCenter process to apply changes
-            subprocess.run(
-                ["killall", "NotificationCenter"],
-                capture_output=True,
-                timeout=5
-            )
-
             status = "enabled" if enable else "disabled"
             return {
                 "ok": True,
@@ -255,6 +188,9 @@ def get_focus_status() -> Dict[str, Any]:
             "error": f"Failed to get Do Not Disturb status: {str(e)}"
         }
 
+# Pending timer that turns focus mode back off, see set_focus_duration
+_focus_timer: Optional[threading.Timer] = None
+
 def set_focus_duration(minutes: int) -> Dict[str, Any]:
     """Set focus mode for a specific duration"""
     try:
@@ -265,21 +201,18 @@ def set_focus_duration(minutes: int) -> Dict[str, Any]:
             }
 
         # Enable Do Not Disturb first
-        enable_result = api_key()
+        enable_result = enable_focus_mode()
         if not enable_result["ok"]:
             return enable_result
 
-        # Schedule turning off Do Not Disturb after specified duration
-        script = f'''
-        do shell script "sleep {minutes * 60} && osascript -e 'tell application \\"System Events\\" to tell process \\"NotificationCenter\\" to click (first button whose description contains \\"Do Not Disturb\\")'"
-        '''
-
-        # Run the scheduled task in background
-        subprocess.Popen(
-            ["osascript", "-e", script],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
+        # Schedule turning off Do Not Disturb after specified duration. An in-process timer
+        # replaces the old sleeping osascript; a newer duration replaces the pending one
+        global _focus_timer
+        if _focus_timer is not None:
+            _focus_timer.cancel()
+        _focus_timer = threading.Timer(minutes * 60.0, disable_focus_mode)
+        _focus_timer.daemon = True
+        _focus_timer.start()
 
         return {
             "ok": True,
@@ -294,6 +227,37 @@ def set_focus_duration(minutes: int) -> Dict[str, Any]:
             "error": f"Failed to set focus duration: {str(e)}"
         }
 
+# The probes below can't change while the process runs, so each is only run once.
+# They only look things up (plist read, PATH scan) instead of starting the tools
+
+@lru_cache(maxsize=1)
+def _macos_version() -> str:
+    """macOS product version, or "unknown" """
+    return platform.mac_ver()[0] or "unknown"
+
+@lru_cache(maxsize=1)
+def _macos_major() -> int:
+    """macOS major version number, 0 if unknown (or not macOS)"""
+    try:
+        return int(_macos_version().split(".")[0])
+    except ValueError:
+        return 0
+
+@lru_cache(maxsize=1)
+def _has_defaults() -> bool:
+    """Whether the defaults command is available"""
+    return shutil.which("defaults") is not None
+
+@lru_cache(maxsize=1)
+def _has_shortcuts() -> bool:
+    """Whether the shortcuts command is available (macOS Monterey+)"""
+    return shutil.which("shortcuts") is not None
+
+@lru_cache(maxsize=1)
+def _has_m_cli() -> bool:
+    """Whether m-cli is installed"""
+    return shutil.which("m") is not None
+
 def diagnose_focus_mode() -> Dict[str, Any]:
     """Diagnose focus mode capabilities on the current system"""
     try:
@@ -305,46 +269,28 @@ def diagnose_focus_mode() -> Dict[str, Any]:
         }
 
         # Check macOS version
-        try:
-            result = subprocess.run([
-                "sw_vers", "-productVersion"
-            ], capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                diagnosis["system_info"]["macos_version"] = result.stdout.strip()
-        except Exception:
-            diagnosis["system_info"]["macos_version"] = "unknown"
+        diagnosis["system_info"]["macos_version"] = _macos_version()
 
         # Check if defaults command works
-        try:
-            result = subprocess.run([
-                "defaults", "-currentHost", "read", "com.apple.notificationcenterui", "dndStart"
-            ], capture_output=True, text=True, timeout=5)
+        if _has_defaults():
             diagnosis["available_methods"].append("defaults_command")
-        except Exception:
+        else:
             diagnosis["recommendations"].append("defaults command not available")
 
         # Check if shortcuts command is available
-        try:
-            result = subprocess.run([
-                "shortcuts", "--help"
-            ], capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                diagnosis["available_methods"].append("shortcuts_command")
-        except Exception:
+        if _has_shortcuts():
+            diagnosis["available_methods"].append("shortcuts_command")
+        else:
             diagnosis["recommendations"].append("shortcuts command not available (requires macOS Monterey+)")
 
         # Check if m-cli is available
-        try:
-            result = subprocess.run([
-                "m", "--version"
-            ], capture_output=True, text=True, timeout=5)
-            if result.returncode == 0:
-                diagnosis["available_methods"].append("m_cli")
-        except Exception:
+        if _has_m_cli():
+            diagnosis["available_methods"].append("m_cli")
+        else:
             diagnosis["recommendations"].append("m-cli not installed (optional: brew install m-cli)")
 
-        # Check current focus status
-        status_result = api_key()
+        # Check current focus status (not cached, it changes)
+        status_result = get_focus_status()
         diagnosis["current_status"] = status_result
 
         # Add recommendations based on available methods
@@ -365,22 +311,22 @@ if __name__ == "__main__":
     print("=" * 40)
 
     # Run diagnosis first
-    diagnosis = api_key()
+    diagnosis = diagnose_focus_mode()
     print("System Diagnosis:")
     print(json.dumps(diagnosis, indent=2))
     print()
 
     # Test getting status
-    status_result = api_key()
+    status_result = get_focus_status()
     print("Current Status:")
     print(json.dumps(status_result, indent=2))
 
     # Test enabling focus mode
-    enable_result = api_key()
+    enable_result = enable_focus_mode()
     print("\nEnable Focus Mode:")
     print(json.dumps(enable_result, indent=2))
 
     # Test setting duration
-    duration_result = api_key(5)
+    duration_result = set_focus_duration(5)
     print("\nSet Focus Duration (5 minutes):")
     print(json.dumps(duration_result, indent=2))
\ No newline at end of file
@@ -1,12 +1,18 @@
 # actions/process_manager.py
 import psutil
 import json
+import os
+import signal
 import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 from typing import Dict, List, Optional, Any
 
-# Essential system processes that should never be killed
-ESSENTIAL_PROCESSES = {
+# Essential system processes that should never be killed (case-folded once here, so matching
+# never has to fold the list again)
+ESSENTIAL_PROCESSES = frozenset(p.casefold() for p in {
     # Core system processes
     "kernel_task", "launchd", "system_profiler", "SystemUIServer",
     "WindowServer", "loginwindow", "Dock", "Finder", "coreservicesd",
@@ -44,41 +50,68 @@ ESSENTIAL_PROCESSES = {
     # Media applications
     "iTunes", "Music", "TV", "Photos", "QuickTime Player",
     "VLC", "Spotify", "Audacity", "Final Cut Pro", "Logic Pro"
-}
+})
+
+# Attributes fetched for every process in one psutil pass. Optional ones are only requested
+# where this platform's psutil has them (e.g. no io_counters on macOS, connections was renamed)
+_CONNECTIONS_ATTR = "net_connections" if hasattr(psutil.Process, "net_connections") else "connections"
+_REQUIRED_ATTRS = [
+    "pid", "name", "status", "create_time", "cpu_percent",
+    "memory_info", "memory_percent", "num_threads", "cmdline",
+]
+_PROCESS_ATTRS = _REQUIRED_ATTRS + [
+    a for a in ("io_counters", _CONNECTIONS_ATTR) if hasattr(psutil.Process, a)
+]
+# Listing the sockets of every process is one of the most expensive reads, so it is opt-in
+_PROCESS_ATTRS_NO_CONNECTIONS = [a for a in _PROCESS_ATTRS if a != _CONNECTIONS_ATTR]
+
+def _build_info(pinfo: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Shape a prefetched psutil attribute dict into a process info dict"""
+    # A process whose core fields are unreadable is skipped
+    if any(pinfo.get(a) is None for a in _REQUIRED_ATTRS):
+        return None
 
-def get_process_info(proc: psutil.Process) -> Dict[str, Any]:
-    """Get detailed information about a process"""
+    io_counters = pinfo.get("io_counters")
+    if _CONNECTIONS_ATTR in pinfo:
+        connections = pinfo[_CONNECTIONS_ATTR]
+        num_connections = len(connections) if connections else 0
+    else:
+        # Not collected
+        num_connections = None
+    return {
+        "pid": pinfo["pid"],
+        "name": pinfo["name"],
+        "status": pinfo["status"],
+        "create_time": pinfo["create_time"],
+        "cpu_percent": pinfo["cpu_percent"],
+        "memory_info": pinfo["memory_info"]._asdict(),
+        "memory_percent": pinfo["memory_percent"],
+        "num_threads": pinfo["num_threads"],
+        "cmdline": " ".join(pinfo["cmdline"]),
+        "io_counters": io_counters._asdict() if io_counters else None,
+        "connections": num_connections,
+    }
+
+def _collect_info(
+    proc: psutil.Process,
+    known: Optional[Dict[str, Any]] = None,
+    attrs: List[str] = _PROCESS_ATTRS
+) -> Optional[Dict[str, Any]]:
+    """Fetch and shape one process's attributes, None if it is gone or unreadable"""
+    # Attributes already in `known` are not fetched again (a second cpu_percent call
+    # would only measure the few ms since the first one)
+    known = known or {}
     try:
-        # Get basic process info
-        info = {
-            "pid": proc.pid,
-            "name": proc.name(),
-            "status": proc.status(),
-            "create_time": proc.create_time(),
-            "cpu_percent": proc.cpu_percent(),
-            "memory_info": proc.memory_info()._asdict(),
-            "memory_percent": proc.memory_percent(),
-            "num_threads": proc.num_threads(),
-            "cmdline": " ".join(proc.cmdline()) if proc.cmdline() else "",
-        }
-
-        # Get I/O counters if available
-        try:
-            io_counters = proc.io_counters()
-            info["io_counters"] = io_counters._asdict() if io_counters else None
-        except (psutil.NoSuchProcess, psutil.AccessDenied, AttributeError):
-            info["io_counters"] = None
-
-        # Get connections if available
-        try:
-            connections = proc.connections()
-            info["connections"] = len(connections) if connections else 0
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            info["connections"] = 0
-
-        return info
+        pinfo = proc.as_dict([a for a in attrs if a not in known], ad_value=None)
     except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
         return None
+    pinfo.update(known)
+    return _build_info(pinfo)
+
+def get_process_info(proc: psutil.Process) -> Dict[str, Any]:
+    """Get detailed information about a process"""
+    # One as_dict read; unreadable io_counters/connections come back as None/0 instead of raising
+    return _collect_info(proc)
 
 def determine_load_level(cpu_percent: float, memory_percent: float, num_threads: int) -> str:
     """Determine if a process has Light, Medium, or Heavy load"""
@@ -93,40 +126,99 @@ def determine_load_level(cpu_percent: float, memory_percent: float, num_threads:
     else:
         return "Light"
 
-def is_essential_process(process_name: str, cmdline: str) -> bool:
-    """Check if a process is essential and should not be killed"""
-    process_name_lower = process_name.lower()
-    cmdline_lower = cmdline.lower()
-
-    # Check against essential processes list
-    for essential in ESSENTIAL_PROCESSES:
-        if essential.lower() in process_name_lower or essential.lower() in cmdline_lower:
-            return True
+# Heuristic fragments that mark a process as essential
+ESSENTIAL_PATTERNS = tuple(p.casefold() for p in (
+    "system", "kernel", "launchd", "windowserver", "dock", "finder",
+    "loginwindow", "coreservices", "security", "trust", "network",
+    "bluetooth", "power", "thermal", "audio", "video", "camera",
+    "location", "notification", "disk", "file", "backup", "sync"
+))
 
-    # Additional heuristics for essential processes
-    essential_patterns = [
-        "system", "kernel", "launchd", "windowserver", "dock", "finder",
-        "loginwindow", "coreservices", "security", "trust", "network",
-        "bluetooth", "power", "thermal", "audio", "video", "camera",
-        "location", "notification", "disk", "file", "backup", "sync"
-    ]
+# Every substring is_essential_process looks for, built once
+_ESSENTIAL_SUBSTRINGS = tuple(ESSENTIAL_PROCESSES.union(ESSENTIAL_PATTERNS))
 
-    for pattern in essential_patterns:
-        if pattern in process_name_lower or pattern in cmdline_lower:
-            return True
-
-    return False
+def is_essential_process(process_name: str, cmdline: str) -> bool:
+    """Check if a process is essential and should not be killed"""
+    process_name_folded = process_name.casefold()
+
+    # Fast path: exact essential name
+    if process_name_folded in ESSENTIAL_PROCESSES:
+        return True
+
+    # Name and cmdline joined by a NUL (never part of a pattern) so each substring is searched once
+    haystack = process_name_folded + "\x00" + cmdline.casefold()
+    return any(s in haystack for s in _ESSENTIAL_SUBSTRINGS)
+
+# Attributes each sort order needs for every process; the rest are only read for the top ones
+_SORT_ATTRS = {
+    "cpu": ["cpu_percent"],
+    "memory": ["memory_percent"],
+    "name": ["name"],
+    "load": ["cpu_percent", "memory_percent", "num_threads"],
+}
+_LOAD_ORDER = {"Heavy": 3, "Medium": 2, "Light": 1}
+
+# Sort key and direction per sort order, applied to the phase 1 attribute dicts
+SORT_KEYS = {
+    "cpu": (itemgetter("cpu_percent"), True),
+    "memory": (itemgetter("memory_percent"), True),
+    "name": (lambda x: x["name"].lower(), False),
+    "load": (lambda x: _LOAD_ORDER[determine_load_level(
+        x["cpu_percent"], x["memory_percent"], x["num_threads"]
+    )], True),
+}
 
-def list_processes(limit: int = 50, sort_by: str = "cpu") -> Dict[str, Any]:
+def list_processes(limit: int = 50, sort_by: str = "cpu", include_connections: bool = False) -> Dict[str, Any]:
     """List all running processes with their resource usage"""
     try:
-        processes = []
+        attrs = _PROCESS_ATTRS if include_connections else _PROCESS_ATTRS_NO_CONNECTIONS
 
-        # Get all processes
-        for proc in psutil.process_iter(['pid', 'name', 'status', 'create_time']):
+        # cpu_percent() is 0.0 on the first call for a process, so take a baseline sample
+        # for every process and let a short interval pass before the real readings below
+        all_procs = list(psutil.process_iter())
+        for proc in all_procs:
+            try:
+                proc.cpu_percent()
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                pass
+        time.sleep(0.1)
+
+        # Phase 1: read only what the sort needs, for every process
+        sort_attrs = _SORT_ATTRS.get(sort_by, [])
+        procs = {}
+        candidates = []
+        for proc in all_procs:
             try:
-                proc_info = api_key(proc)
-                if proc_info:
+                known = proc.as_dict(sort_attrs, ad_value=None) if sort_attrs else {}
+            except psutil.NoSuchProcess:
+                continue
+            if any(known[a] is None for a in sort_attrs):
+                continue
+            procs[proc.pid] = proc
+            known["pid"] = proc.pid
+            candidates.append(known)
+
+        # Sort processes (unknown sort orders keep process_iter's order)
+        if sort_by in SORT_KEYS:
+            key, reverse = SORT_KEYS[sort_by]
+            candidates.sort(key=key, reverse=reverse)
+
+        # Phase 2: full info only for the top `limit`. Their attributes are read on a thread
+        # pool so the per-process kernel calls overlap; processes that turn out unreadable
+        # are replaced by the next candidates
+        processes = []
+        # Summary totals are accumulated as each process is added, instead of separate passes after
+        total_cpu = total_memory = 0.0
+        load_counts = {"Light": 0, "Medium": 0, "Heavy": 0}
+        start = 0
+        with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as ex:
+            while len(processes) < limit and start < len(candidates):
+                window = candidates[start:start + limit - len(processes)]
+                start += len(window)
+                for proc_info in ex.map(lambda k: _collect_info(procs[k["pid"]], k, attrs), window):
+                    if not proc_info:
+                        continue
+
                     # Add load level
                     proc_info["load_level"] = determine_load_level(
                         proc_info["cpu_percent"],
@@ -141,29 +233,9 @@ def list_processes(limit: int = 50, sort_by: str = "cpu") -> Dict[str, Any]:
                     )
 
                     processes.append(proc_info)
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                continue
-
-        # Sort processes
-        if sort_by == "cpu":
-            processes.sort(key=lambda x: x["cpu_percent"], reverse=True)
-        elif sort_by == "memory":
-            processes.sort(key=lambda x: x["memory_percent"], reverse=True)
-        elif sort_by == "name":
-            processes.sort(key=lambda x: x["name"].lower())
-        elif sort_by == "load":
-            load_order = {"Heavy": 3, "Medium": 2, "Light": 1}
-            processes.sort(key=lambda x: load_order.get(x["load_level"], 0), reverse=True)
-
-        # Limit results
-        processes = processes[:limit]
-
-        # Calculate summary statistics
-        total_cpu = sum(p["cpu_percent"] for p in processes)
-        total_memory = sum(p["memory_percent"] for p in processes)
-        load_counts = {"Light": 0, "Medium": 0, "Heavy": 0}
-        for p in processes:
-            load_counts[p["load_level"]] += 1
+                    total_cpu += proc_info["cpu_percent"]
+                    total_memory += proc_info["memory_percent"]
+                    load_counts[proc_info["load_level"]] += 1
 
         return {
             "ok": True,
@@ -182,60 +254,97 @@ def list_processes(limit: int = 50, sort_by: str = "cpu") -> Dict[str, Any]:
 def kill_process(pid: int, force: bool = False) -> Dict[str, Any]:
     """Safely kill a process by PID"""
     try:
-        proc = psutil.Process(pid)
-        proc_info = api_key(proc)
-
-        if not proc_info:
+        # Signal 0 only asks the kernel whether the PID exists, cheaper than psutil reading /proc for a
+        # process that is already gone. Not on Windows, where os.kill with any other signal terminates
+        # the process; pid <= 0 would address a whole process group. It sits inside the try so a
+        # malformed pid (a string or float from the LLM, an out-of-range int) still gets an error dict
+        if os.name != "nt" and pid > 0:
+            try:
+                os.kill(pid, 0)
+            except PermissionError:
+                pass  # Exists, owned by someone else; psutil reports the access error below
+
+        # The essential check only needs these two, not the full get_process_info read
+        proc_info = psutil.Process(pid).as_dict(["name", "cmdline"], ad_value=None)
+        name = proc_info["name"]
+        if name is None:
             return {"ok": False, "error": f"Process {pid} not found"}
 
         # Check if process is essential
-        if is_essential_process(proc_info["name"], proc_info["cmdline"]):
+        if is_essential_process(name, " ".join(proc_info["cmdline"] or ())):
             return {
                 "ok": False,
-                "error": f"Cannot kill essential process: {proc_info['name']} (PID: {pid})",
-                "process_name": proc_info["name"],
+                "error": f"Cannot kill essential process: {name} (PID: {pid})",
+                "process_name": name,
                 "is_essential": True
             }
 
-        # Kill the process
+        # Kill the process (SIGKILL doesn't exist on Windows, where SIGTERM already terminates it)
         if force:
-            proc.kill()
+            os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
             action = "force killed"
         else:
-            proc.terminate()
+            os.kill(pid, signal.SIGTERM)
             action = "terminated"
 
         return {
             "ok": True,
-            "message": f"Process {proc_info['name']} (PID: {pid}) {action}",
-            "process_name": proc_info["name"],
+            "message": f"Process {name} (PID: {pid}) {action}",
+            "process_name": name,
             "pid": pid,
             "action": action
         }
 
-    except psutil.NoSuchProcess:
+    except (psutil.NoSuchProcess, ProcessLookupError):
         return {"ok": False, "error": f"Process {pid} not found"}
-    except psutil.AccessDenied:
+    except (psutil.AccessDenied, PermissionError):
         return {"ok": False, "error": f"Access denied to kill process {pid}"}
     except Exception as e:
         return {"ok": False, "error": f"Failed to kill process {pid}: {str(e)}"}
 
+def _has_name(pid: int, name: str) -> bool:
+    """Whether process `pid` is named exactly `name`"""
+    try:
+        return psutil.Process(pid).name() == name
+    except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+        return False
+
+def _pids_by_name(name: str) -> List[int]:
+    """PIDs of processes whose name is exactly `name`"""
+    # pgrep reads the kernel's process table in one call. It only sees the short kernel name
+    # (15 chars on Linux, 16 on macOS), so longer names, and systems without pgrep, use psutil.
+    # Its pattern is a regex and a 15-char name also matches longer names cut to that length,
+    # so every PID it returns is checked against the full name before anything is killed
+    if len(name) <= 15:
+        try:
+            result = subprocess.run(["pgrep", "-x", name], capture_output=True, text=True, timeout=5)
+            # 0: matches found, 1: no match
+            if result.returncode in (0, 1):
+                return [int(pid) for pid in result.stdout.split() if _has_name(int(pid), name)]
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+
+    pids = []
+    for proc in psutil.process_iter(['pid', 'name']):
+        try:
+            if proc.info['name'] == name:
+                pids.append(proc.info['pid'])
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+    return pids
+
 def kill_processes_by_name(name: str, force: bool = False) -> Dict[str, Any]:
     """Kill all processes with a specific name"""
     try:
-        api_key = []
+        killed_processes = []
         failed_processes = []
 
-        for proc in psutil.process_iter(['pid', 'name']):
-            try:
-                if proc.info['name'] == name:
-                    result = kill_process(proc.info['pid'], force)
-                    if result['ok']:
-                        killed_processes.append(result)
-                    else:
-                        api_key.append(result)
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
+        for pid in _pids_by_name(name):
+            result = kill_process(pid, force)
+            if result['ok']:
+                killed_processes.append(result)
+            else:
+                failed_processes.append(result)
 
         return {
             "ok": True,
@@ -253,8 +362,12 @@ def kill_processes_by_name(name: str, force: bool = False) -> Dict[str, Any]:
 def get_system_resources() -> Dict[str, Any]:
     """Get overall system resource usage"""
     try:
-        # CPU usage
-        cpu_percent = psutil.cpu_percent(interval=1)
+        # CPU usage: prime the total and per-core counters, then sample both over the same second
+        psutil.cpu_percent(interval=None)
+        psutil.cpu_percent(interval=None, percpu=True)
+        time.sleep(1)
+        cpu_percent = psutil.cpu_percent(interval=None)
+        cpu_per_core = psutil.cpu_percent(interval=None, percpu=True)
         cpu_count = psutil.cpu_count()
 
         # Memory usage
@@ -275,7 +388,7 @@ def get_system_resources() -> Dict[str, Any]:
             "cpu": {
                 "usage_percent": cpu_percent,
                 "count": cpu_count,
-                "usage_per_core": psutil.cpu_percent(interval=1, percpu=True)
+                "usage_per_core": cpu_per_core
             },
             "memory": {
                 "total": memory.total,
@@ -292,7 +405,7 @@ def get_system_resources() -> Dict[str, Any]:
                 "total": disk.total,
                 "used": disk.used,
                 "free": disk.free,
-                "usage_percent": (disk.used / disk.total) * 100
+                "usage_percent": disk.percent
             },
             "network": {
                 "bytes_sent": net_io.bytes_sent,
@@ -302,7 +415,7 @@ def get_system_resources() -> Dict[str, Any]:
             },
             "system": {
                 "boot_time": boot_time,
-                "uptime_seconds": psutil.time.time() - boot_time
+                "uptime_seconds": time.time() - boot_time
             }
         }
 
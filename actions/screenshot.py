@@ -1,31 +1,92 @@
 # actions/screenshot.py
 import subprocess
 import json
+import asyncio
+import random
+import shutil
+import struct
 import os
 import tempfile
-from typing import Dict, Any, Optional
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from datetime import datetime
 
-with open("config.json", "r") as f:
-    config = json.load(f)
+from config import get_config
 
-gemini_config = config.get("gemini")
+# Optional: with pyobjc installed the screen is captured in-process through CoreGraphics
+# instead of spawning screencapture and reading its file back
+try:
+    import Quartz
+    from Foundation import NSMutableData
+except ImportError:
+    Quartz = None
+
+gemini_config = get_config().get("gemini")
 api_key = gemini_config.get("key")
 model = gemini_config.get("model")
 
-def take_screenshot(save_path: Optional[str] = None) -> Dict[str, Any]:
-    """Take a screenshot and save it to a file"""
+# Screenshots are saved as JPEG unless a .png path is asked for: for the AI analysis it looks the
+# same as PNG at a fraction of the size, which is less to write, hash and upload
+JPEG_QUALITY = 80
+
+def _capture_quartz(fmt: str) -> Optional[bytes]:
+    """Main display captured with CoreGraphics as "jpg" or "png", None if unavailable"""
+    if Quartz is None:
+        return None
+    try:
+        # None when the process has no screen recording permission
+        image = Quartz.CGDisplayCreateImage(Quartz.CGMainDisplayID())
+        if image is None:
+            return None
+
+        # Encode straight into an in-memory buffer
+        data = NSMutableData.data()
+        if fmt == "png":
+            dest = Quartz.CGImageDestinationCreateWithData(data, "public.png", 1, None)
+            Quartz.CGImageDestinationAddImage(dest, image, None)
+        else:
+            dest = Quartz.CGImageDestinationCreateWithData(data, "public.jpeg", 1, None)
+            Quartz.CGImageDestinationAddImage(
+                dest, image, {Quartz.kCGImageDestinationLossyCompressionQuality: JPEG_QUALITY / 100}
+            )
+        if not Quartz.CGImageDestinationFinalize(dest):
+            return None
+        return bytes(data)
+    except Exception:
+        return None
+
+def _take_screenshot(save_path: Optional[str] = None) -> Tuple[Dict[str, Any], Optional[bytes]]:
+    """take_screenshot, plus the image bytes when they were captured in memory (else None)"""
     try:
         # Generate filename if not provided
         if not save_path:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            save_path = os.path.join(os.path.expanduser("~/Desktop"), f"screenshot_{timestamp}.png")
-        
+            save_path = os.path.join(os.path.expanduser("~/Desktop"), f"screenshot_{timestamp}.jpg")
+        fmt = "png" if save_path.lower().endswith(".png") else "jpg"
+
+        # In-process capture first; the file is still written since callers get its path
+        image_data = _capture_quartz(fmt)
+        if image_data is not None:
+            with open(save_path, "wb") as f:
+                f.write(image_data)
+            return {
+                "ok": True,
+                "message": "Screenshot taken successfully",
+                "file_path": save_path,
+                "file_size": len(image_data),
+                "timestamp": datetime.now().isoformat()
+            }, image_data
+
         # Use screencapture command on macOS
         result = subprocess.run([
-            "screencapture", "-x", save_path
+            "screencapture", "-x", "-t", fmt, save_path
         ], capture_output=True, text=True, timeout=10)
-        
+
         if result.returncode == 0:
             # Verify the file was created
             if os.path.exists(save_path):
@@ -36,41 +97,350 @@ def take_screenshot(save_path: Optional[str] = None) -> Dict[str, Any]:
                     "file_path": save_path,
                     "file_size": file_size,
                     "timestamp": datetime.now().isoformat()
-                }
+                }, None
             else:
                 return {
                     "ok": False,
                     "error": "Screenshot file was not created"
-                }
+                }, None
         else:
             return {
                 "ok": False,
                 "error": f"Screenshot failed: {result.stderr}"
-            }
-            
+            }, None
+
     except subprocess.TimeoutExpired:
         return {
             "ok": False,
             "error": "Screenshot timed out"
-        }
+        }, None
     except Exception as e:
         return {
             "ok": False,
             "error": f"Failed to take screenshot: {str(e)}"
-        }
+        }, None
+
+def take_screenshot(save_path: Optional[str] = None) -> Dict[str, Any]:
+    """Take a screenshot and save it to a file"""
+    return _take_screenshot(save_path)[0]
+
+# One genai client for every analysis, so its HTTP connection pool is reused across calls
+_client = None
+_client_lock = threading.Lock()
+
+def _lazy_client():
+    """The shared genai client, created on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            # Another thread may have created it while this one waited
+            if _client is None:
+                from google import genai
+                _client = genai.Client(api_key=api_key)
+    return _client
+
+# Gemini answers for screenshots already analyzed, keyed on image hash + action + language.
+# A small in-process LRU sits in front of a sqlite file so answers also survive restarts
+ANALYSIS_CACHE_PATH = os.path.expanduser("~/.vibe-wrapper/screenshot_cache.sqlite3")
+ANALYSIS_CACHE_TTL = 60 * 60  # seconds
+_ANALYSIS_MEMORY_SIZE = 128
+_analysis_memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+_analysis_lock = threading.Lock()
+
+def _analysis_cache_key(image_data: bytes, action: str, language: str) -> str:
+    """Cache key for one analysis request"""
+    return hashlib.blake2b(image_data, digest_size=16).hexdigest() + ":" + action + ":" + language
+
+def _analysis_db() -> sqlite3.Connection:
+    """Open the on-disk analysis cache, creating it if needed"""
+    os.makedirs(os.path.dirname(ANALYSIS_CACHE_PATH), exist_ok=True)
+    conn = sqlite3.connect(ANALYSIS_CACHE_PATH, timeout=5)
+    conn.execute("CREATE TABLE IF NOT EXISTS analysis (key TEXT PRIMARY KEY, ts INTEGER, response TEXT)")
+    return conn
+
+def _cached_analysis(key: str) -> Optional[str]:
+    """Cached answer for `key` if it is younger than the TTL, else None"""
+    now = time.time()
+    with _analysis_lock:
+        hit = _analysis_memory.get(key)
+        if hit and now - hit[0] < ANALYSIS_CACHE_TTL:
+            _analysis_memory.move_to_end(key)
+            return hit[1]
+
+    # The cache is only an optimization, a broken or locked db just means a miss
+    try:
+        with closing(_analysis_db()) as conn:
+            row = conn.execute("SELECT ts, response FROM analysis WHERE key = ?", (key,)).fetchone()
+    except sqlite3.Error:
+        return None
+    if not row or now - row[0] >= ANALYSIS_CACHE_TTL:
+        return None
+
+    with _analysis_lock:
+        _analysis_memory[key] = (row[0], row[1])
+        if len(_analysis_memory) > _ANALYSIS_MEMORY_SIZE:
+            _analysis_memory.popitem(last=False)
+    return row[1]
+
+def _store_analysis(key: str, response: str) -> None:
+    """Remember the answer for `key` in memory and on disk"""
+    now = time.time()
+    with _analysis_lock:
+        _analysis_memory[key] = (now, response)
+        _analysis_memory.move_to_end(key)
+        if len(_analysis_memory) > _ANALYSIS_MEMORY_SIZE:
+            _analysis_memory.popitem(last=False)
+    try:
+        # closing() closes the connection; the inner `with conn` only commits the transaction
+        with closing(_analysis_db()) as conn, conn:
+            conn.execute("DELETE FROM analysis WHERE ts < ?", (int(now - ANALYSIS_CACHE_TTL),))
+            conn.execute("INSERT OR REPLACE INTO analysis VALUES (?, ?, ?)", (key, int(now), response))
+    except sqlite3.Error:
+        pass
+
+def _analysis_prompt(action: str, language: str) -> str:
+    """Prompt sent with the screenshot for an action"""
+    # No markdown addon
+    no_markdown = 'Please respond in natural english as if it were two people talking. Do not use markdown, bullet points, or formatting, including "\\n"'
+    if action == "summarize":
+        return f"Please analyze this screenshot and provide a detailed summary of what you see. Focus on the main content, text, and key elements visible in the image." + no_markdown
+    elif action == "translate":
+        return f"Please analyze this screenshot and translate any text you see to {language}. If there are multiple languages, translate all text to {language}." + no_markdown
+    elif action == "describe":
+        return "Please provide a detailed description of what you see in this screenshot, including any text, UI elements, and visual content."  + no_markdown
+    else:
+        return f"Please analyze this screenshot and {action}."
+
+def _load_image(image_path: str, image_bytes: Optional[bytes]) -> bytes:
+    """The screenshot's bytes, read from image_path unless they were handed over in memory"""
+    if image_bytes is not None:
+        return image_bytes
+    with open(image_path, 'rb') as image_file:
+        return image_file.read()
+
+# Longest side of the image sent to Gemini. Retina captures are 2-4x this; downscaling them first
+# cuts the upload and the image tokens without losing what a summary needs
+UPLOAD_MAX_SIDE = 1568
+
+def _image_mime(data: bytes) -> str:
+    """Mime type of a screenshot from its magic bytes (JPEG or PNG)"""
+    return "image/jpeg" if data[:3] == b"\xff\xd8\xff" else "image/png"
 
-def analyze_screenshot_with_ai(image_path: str, action: str = "summarize", language: str = "english") -> Dict[str, Any]:
+def _image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) from a PNG or JPEG header, None if it can't be read"""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:2] != b"\xff\xd8":
+        return None
+
+    # JPEG: walk the marker segments up to the start-of-frame, which holds the dimensions
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # Fill byte
+            i += 1
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+    return None
+
+def _downscale_for_upload(image_data: bytes) -> Tuple[bytes, str]:
+    """Image bytes and mime type to upload: a JPEG fitting UPLOAD_MAX_SIDE, or the original if already small"""
+    mime_type = _image_mime(image_data)
+    size = _image_size(image_data)
+    if not size or max(size) <= UPLOAD_MAX_SIDE or shutil.which("sips") is None:
+        return image_data, mime_type
+
+    # sips ships with macOS, so resizing needs no imaging library
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "in.jpg" if mime_type == "image/jpeg" else "in.png")
+            dst = os.path.join(tmp, "out.jpg")
+            with open(src, "wb") as f:
+                f.write(image_data)
+            result = subprocess.run([
+                "sips", "-Z", str(UPLOAD_MAX_SIDE), "-s", "format", "jpeg",
+                "-s", "formatOptions", "85", src, "--out", dst
+            ], capture_output=True, timeout=10)
+            if result.returncode != 0:
+                return image_data, mime_type
+            with open(dst, "rb") as f:
+                return f.read(), "image/jpeg"
+    except (OSError, subprocess.TimeoutExpired):
+        return image_data, mime_type
+
+def _stream_analysis(
+    image_data: bytes,
+    prompt: str,
+    cache_key: str,
+    phash_key: Optional[Tuple[str, str, int]] = None
+) -> Iterator[str]:
+    """Yield Gemini's answer piece by piece as it arrives, caching the full text at the end"""
+    from google.genai import types
+
+    # Only on a cache miss; the cache key is the original image, the resize is deterministic
+    upload_data, mime_type = _downscale_for_upload(image_data)
+
+    response = _lazy_client().models.generate_content_stream(
+        model="gemini-2.5-pro",
+        contents=[
+            types.Part.from_bytes(
+                data=upload_data,
+                mime_type=mime_type
+            ),
+            # types.Part.from_text(prompt)
+            prompt
+        ]
+    )
+
+    parts = []
+    for chunk in response:
+        text = chunk.text
+        if text:
+            parts.append(text)
+            yield text
+
+    if parts:
+        _store_analysis(cache_key, "".join(parts))
+        if phash_key is not None:
+            _store_similar(phash_key, "".join(parts))
+
+def stream_screenshot_analysis(
+    image_path: str,
+    action: str = "summarize",
+    language: str = "english",
+    image_bytes: Optional[bytes] = None
+) -> Iterator[str]:
+    """Like analyze_screenshot_with_ai, but yields the answer text as it streams in (raises on errors)"""
+    if not api_key:
+        raise RuntimeError("GEMINI_API_KEY environment variable not set")
+
+    image_data = _load_image(image_path, image_bytes)
+    cache_key = _analysis_cache_key(image_data, action, language)
+    cached, phash_key = _cached_or_similar(image_data, action, language, cache_key)
+    if cached is not None:
+        yield cached
+        return
+
+    yield from _stream_analysis(image_data, _analysis_prompt(action, language), cache_key, phash_key)
+
+# Second-chance cache for screenshots that aren't byte-identical but look the same (e.g. only the
+# menu bar clock changed): answers keyed on a DHASH_SIZE x DHASH_SIZE difference hash, a hit is any
+# entry for the same action and language within PHASH_MAX_DISTANCE differing bits.
+# Trade-off: a coarse hash can't see text. At 16x16 two different documents or chats in the same app
+# hash alike and would get each other's answer, so the grid is 64x64 (one cell is a few lines of text
+# on a laptop screen) and only a handful of bits may differ. Even so, a one-word edit can slip
+# through, so near matches are only reused for PHASH_ACTIONS, whose answers describe the screen as a
+# whole; translate depends on the exact text and never skips the request (nor pays for the sips run)
+DHASH_SIZE = 64
+PHASH_MAX_DISTANCE = 4
+PHASH_ACTIONS = frozenset({"summarize", "describe"})
+_PHASH_CACHE_SIZE = 128
+_phash_cache: "OrderedDict[Tuple[str, str, int], Tuple[float, str]]" = OrderedDict()
+
+def _dhash(image_data: bytes) -> Optional[int]:
+    """DHASH_SIZE x DHASH_SIZE difference hash of the image, None if it can't be computed (no sips)"""
+    if shutil.which("sips") is None:
+        return None
+
+    # sips shrinks the image to (DHASH_SIZE + 1) x DHASH_SIZE and writes an uncompressed BMP, which
+    # is trivial to read
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            src = os.path.join(tmp, "in.jpg" if _image_mime(image_data) == "image/jpeg" else "in.png")
+            dst = os.path.join(tmp, "out.bmp")
+            with open(src, "wb") as f:
+                f.write(image_data)
+            result = subprocess.run([
+                "sips", "-s", "format", "bmp", "-z", str(DHASH_SIZE), str(DHASH_SIZE + 1), src, "--out", dst
+            ], capture_output=True, timeout=10)
+            if result.returncode != 0:
+                return None
+            with open(dst, "rb") as f:
+                bmp = f.read()
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+    offset, = struct.unpack_from("<I", bmp, 10)
+    width, height = struct.unpack_from("<ii", bmp, 18)
+    bpp, = struct.unpack_from("<H", bmp, 28)
+    if (width, abs(height)) != (DHASH_SIZE + 1, DHASH_SIZE) or bpp not in (24, 32):
+        return None
+
+    step = bpp // 8
+    row_size = (bpp * width + 31) // 32 * 4
+    h = 0
+    for y in range(DHASH_SIZE):
+        # Rows are stored bottom-up unless the height is negative
+        row = offset + (DHASH_SIZE - 1 - y if height > 0 else y) * row_size
+        # Pixels are B, G, R(, A); a luma approximation is enough to compare neighbours
+        luma = [
+            bmp[row + x * step] * 114 + bmp[row + x * step + 1] * 587 + bmp[row + x * step + 2] * 299
+            for x in range(DHASH_SIZE + 1)
+        ]
+        for x in range(DHASH_SIZE):
+            h = (h << 1) | (luma[x] < luma[x + 1])
+    return h
+
+def _similar_analysis(phash_key: Tuple[str, str, int]) -> Optional[str]:
+    """Cached answer for a recent screenshot that looks like this one, else None"""
+    action, language, phash = phash_key
+    now = time.time()
+    with _analysis_lock:
+        # Newest first; at most _PHASH_CACHE_SIZE entries, so a linear scan is cheap
+        for key in reversed(_phash_cache):
+            ts, response = _phash_cache[key]
+            if (key[0] == action and key[1] == language and now - ts < ANALYSIS_CACHE_TTL
+                    and bin(key[2] ^ phash).count("1") <= PHASH_MAX_DISTANCE):
+                _phash_cache.move_to_end(key)
+                return response
+    return None
+
+def _store_similar(phash_key: Tuple[str, str, int], response: str) -> None:
+    """Remember the answer for a screenshot's perceptual hash"""
+    with _analysis_lock:
+        _phash_cache[phash_key] = (time.time(), response)
+        _phash_cache.move_to_end(phash_key)
+        if len(_phash_cache) > _PHASH_CACHE_SIZE:
+            _phash_cache.popitem(last=False)
+
+def _cached_or_similar(image_data: bytes, action: str, language: str, cache_key: str) -> Tuple[Optional[str], Optional[Tuple[str, str, int]]]:
+    """Cached answer (exact, then look-alike) and the perceptual key to store a new answer under"""
+    cached = _cached_analysis(cache_key)
+    if cached is not None:
+        return cached, None
+
+    # Only hashed perceptually on an exact miss, and only for actions that may reuse a near match
+    if action not in PHASH_ACTIONS:
+        return None, None
+    phash = _dhash(image_data)
+    if phash is None:
+        return None, None
+    phash_key = (action, language, phash)
+    return _similar_analysis(phash_key), phash_key
+
+def analyze_screenshot_with_ai(
+    image_path: str,
+    action: str = "summarize",
+    language: str = "english",
+    image_bytes: Optional[bytes] = None
+) -> Dict[str, Any]:
     """Analyze screenshot using AI for summarization or translation"""
     try:
-        if not os.path.exists(image_path):
+        # With image_bytes the image is already in memory and the file isn't read
+        if image_bytes is None and not os.path.exists(image_path):
             return {
                 "ok": False,
                 "error": f"Screenshot file not found: {image_path}"
             }
 
-        # Import the LLM module for AI analysis
+        # Import the GenAI SDK for AI analysis
         try:
-            import llm
             from google import genai
             from google.genai import types
         except ImportError:
@@ -86,45 +456,30 @@ def analyze_screenshot_with_ai(image_path: str, action: str = "summarize", langu
                 "error": "GEMINI_API_KEY environment variable not set"
             }
 
-        client = genai.Client(api_key=api_key)
-
-        # No markdown addon
-        no_markdown = 'Please respond in natural english as if it were two people talking. Do not use markdown, bullet points, or formatting, including "\\n"'
         # Configure the AI request
-        if action == "summarize":
-            prompt = f"Please analyze this screenshot and provide a detailed summary of what you see. Focus on the main content, text, and key elements visible in the image." + no_markdown
-        elif action == "translate":
-            prompt = f"Please analyze this screenshot and translate any text you see to {language}. If there are multiple languages, translate all text to {language}." + no_markdown
-        elif action == "describe":
-            prompt = "Please provide a detailed description of what you see in this screenshot, including any text, UI elements, and visual content."  + no_markdown
-        else:
-            prompt = f"Please analyze this screenshot and {action}."
-
-        # Read the image file
-        with open(image_path, 'rb') as image_file:
-            image_data = image_file.read()
-
-        # Create the AI request
-        response = client.models.generate_content(
-            model="gemini-2.5-pro",
-            contents=[
-                types.Part.from_bytes(
-                    data=image_data,
-                    mime_type="image/png"
-                ),
-                # types.Part.from_text(prompt)
-                prompt
-            ]
-        )
+        prompt = _analysis_prompt(action, language)
 
-        # Extract the response text
-        if hasattr(response, 'text'):
-            ai_response = response.text
-        elif hasattr(response, 'candidates') and response.candidates:
-            print("Candidates got triggered") 
-            ai_response = response.candidates[0].content.parts[0].text
-        else:
-            ai_response = "No response generated"
+        # Read the image file (unless it was handed over in memory)
+        image_data = _load_image(image_path, image_bytes)
+
+        # Same (or same-looking) image, action and language analyzed recently: answer without
+        # calling Gemini
+        cache_key = _analysis_cache_key(image_data, action, language)
+        cached, phash_key = _cached_or_similar(image_data, action, language, cache_key)
+        if cached is not None:
+            return {
+                "ok": True,
+                "message": f"Screenshot analyzed successfully",
+                "action": action,
+                "language": language,
+                "analysis": cached,
+                "image_path": image_path,
+                "timestamp": datetime.now().isoformat(),
+                "cached": True
+            }
+
+        # Create the AI request (streamed, joined back into one answer here)
+        ai_response = "".join(_stream_analysis(image_data, prompt, cache_key, phash_key)) or "No response generated"
 
         return {
             "ok": True,
@@ -142,19 +497,45 @@ def analyze_screenshot_with_ai(image_path: str, action: str = "summarize", langu
             "error": f"AI analysis failed: {str(e)}"
         }
 
+# At most this many screenshots are analyzed at once by analyze_many
+ANALYZE_CONCURRENCY = 8
+ANALYZE_RETRIES = 4
+
+def _is_rate_limited(result: Dict[str, Any]) -> bool:
+    """Whether a failed analysis was rejected by Gemini's rate limit"""
+    error = result.get("error", "")
+    return not result["ok"] and ("429" in error or "RESOURCE_EXHAUSTED" in error)
+
+async def analyze_many(image_paths: List[str], action: str = "summarize", language: str = "english") -> List[Dict[str, Any]]:
+    """Analyze several screenshots concurrently, results in the order of image_paths"""
+    sem = asyncio.Semaphore(ANALYZE_CONCURRENCY)
+
+    async def _analyze_one(path: str) -> Dict[str, Any]:
+        async with sem:
+            for attempt in range(ANALYZE_RETRIES + 1):
+                # The SDK call blocks, so each analysis runs on a worker thread
+                result = await asyncio.to_thread(analyze_screenshot_with_ai, path, action, language)
+                if not _is_rate_limited(result) or attempt == ANALYZE_RETRIES:
+                    return result
+                # Exponential backoff with jitter so the retries don't arrive together
+                await asyncio.sleep((2 ** attempt) + random.random())
+
+    return await asyncio.gather(*(_analyze_one(p) for p in image_paths))
+
 def take_and_analyze_screenshot(action: str = "summarize", language: str = "english", save_path: Optional[str] = None) -> Dict[str, Any]:
     """Take a screenshot and immediately analyze it with AI"""
     try:
         # Take the screenshot first
-        screenshot_result = take_screenshot(save_path)
+        screenshot_result, image_data = _take_screenshot(save_path)
         if not screenshot_result["ok"]:
             return screenshot_result
         
-        # Analyze the screenshot
-        analysis_result = api_key(
+        # Analyze the screenshot (the in-memory capture, if there is one, isn't read back)
+        analysis_result = analyze_screenshot_with_ai(
             screenshot_result["file_path"], 
             action, 
-            language
+            language,
+            image_data
         )
         
         if not analysis_result["ok"]:
@@ -205,9 +586,9 @@ if __name__ == "__main__":
     
     if result["ok"]:
         print("\n2. Analyzing screenshot:")
-        analysis = api_key(result["file_path"], "summarize")
+        analysis = analyze_screenshot_with_ai(result["file_path"], "summarize")
         print(json.dumps(analysis, indent=2))
     
     print("\n3. Take and analyze in one step:")
-    combined = api_key("summarize")
+    combined = take_and_analyze_screenshot("summarize")
     print(json.dumps(combined, indent=2))
\ No newline at end of file
@@ -21,6 +21,7 @@ def start_trigger():
     SERIAL_PORT = get_serial_port()
     print(f"Connecting to {SERIAL_PORT}...")
 
+    ser = None
     while True:
         try:
             ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
@@ -28,25 +29,35 @@ def start_trigger():
             print("Ready. Waiting for START signal...")
 
             while True:
-                if ser.in_waiting:
-                    line = ser.readline().decode('utf-8', errors='ignore').strip()
-                    print(f"[Arduino → Python]: {line}")
+                # readline blocks until a line arrives or the 1s timeout passes, instead of
+                # spinning on in_waiting. The timeout keeps Ctrl+C responsive
+                raw = ser.readline()
+                if not raw:
+                    continue
 
-                    if line == "START":
-                        print("START received. Running executer.py...")
-                        # result = subprocess.run(["python", "executer.py"])
-                        import executer
-                        executer.main()
-                        # print("executer.py finished with return code:", result.returncode)
+                line = raw.decode('utf-8', errors='ignore').strip()
+                print(f"[Arduino → Python]: {line}")
 
-                        ser.write(b"DONE\n")
-                        print("DONE sent back to Arduino.\nWaiting for next START...")
+                if line == "START":
+                    print("START received. Running executer.py...")
+                    # result = subprocess.run(["python", "executer.py"])
+                    import executer
+                    executer.main()
+                    # print("executer.py finished with return code:", result.returncode)
+
+                    ser.write(b"DONE\n")
+                    print("DONE sent back to Arduino.\nWaiting for next START...")
 
         except serial.SerialException as e:
             print(f"Error opening serial port: {e}")
+            # Wait before reconnecting instead of retrying in a tight loop
+            time.sleep(1)
 
         except KeyboardInterrupt:
             print("Exiting.")
+            if ser is not None:
+                ser.close()
+            return
 
 # import serial
 # import serial.tools.list_ports
@@ -0,0 +1,12 @@
+# config.py
+import json
+from functools import lru_cache
+
+CONFIG_PATH = "config.json"
+
+@lru_cache(maxsize=1)
+def get_config() -> dict:
+    """config.json, read and parsed once per process (shared, don't mutate it)"""
+    # main.check_config rewrites the file and calls get_config.cache_clear() afterwards
+    with open(CONFIG_PATH, "r") as f:
+        return json.load(f)
@@ -12,34 +12,72 @@ from workflows import auto_commit
 
 from server import get_cwd
 
-import llm
+def _llm():
+    # Imported on first use: it pulls in the Gemini SDK, and whisper through whisperSTT
+    import llm
+    return llm
 
+def _commit_active_project() -> Dict[str, Any]:
+    # Commit whichever project VS Code last reported as focused
+    return auto_commit(get_cwd())
+
+# Action name -> (handler, ((arg, default), ...)). The args are passed to the handler positionally,
+# in this order, so a table entry is all it takes to add an action
 ACTIONS = {
-    "open_path": lambda args: open_path(args.get("path", "")),
-    "open_url": lambda args: open_url(args.get("url", "")),
-    "process_list": lambda args: list_processes(
-        limit=args.get("limit", 50),
-        sort_by=args.get("sort_by", "cpu")
-    ),
-    "kill_process": lambda args: kill_process(
-        pid=args.get("pid"),
-        force=args.get("force", False)
-    ),
-    "kill_processes_by_name": lambda args: api_key(
-        name=args.get("name"),
-        force=args.get("force", False)
-    ),
-    "system_resources": lambda args: api_key(),
-    "enable_focus_mode": lambda args: api_key(),
-    "disable_focus_mode": lambda args: api_key(),
-    "focus_status": lambda args: api_key(),
-    "set_focus_duration": lambda args: api_key(args.get("minutes", 30)),
-    "take_screenshot": lambda args: take_screenshot(args.get("save_path")),
-    "screenshot_and_summarize": lambda args: api_key(args.get("language", "english")),
-    "screenshot_and_translate": lambda args: api_key(args.get("language", "english")),
-    "screenshot_and_describe": lambda args: api_key(),
-    "take_and_analyze_screenshot": lambda args: api_key(args.get("action", "summarize"), args.get("language", "english"), args.get("save_path")),
-    "commit": lambda args: auto_commit(get_cwd())
+    "open_path": (open_path, (("path", ""),)),
+    "open_url": (open_url, (("url", ""),)),
+    "process_list": (list_processes, (("limit", 50), ("sort_by", "cpu"), ("include_connections", False))),
+    "kill_process": (kill_process, (("pid", None), ("force", False))),
+    "kill_processes_by_name": (kill_processes_by_name, (("name", None), ("force", False))),
+    "system_resources": (get_system_resources, ()),
+    "enable_focus_mode": (enable_focus_mode, ()),
+    "disable_focus_mode": (disable_focus_mode, ()),
+    "focus_status": (get_focus_status, ()),
+    "set_focus_duration": (set_focus_duration, (("minutes", 30),)),
+    "take_screenshot": (take_screenshot, (("save_path", None),)),
+    "screenshot_and_summarize": (screenshot_and_summarize, (("language", "english"),)),
+    "screenshot_and_translate": (screenshot_and_translate, (("language", "english"),)),
+    "screenshot_and_describe": (screenshot_and_describe, ()),
+    "take_and_analyze_screenshot": (take_and_analyze_screenshot, (("action", "summarize"), ("language", "english"), ("save_path", None))),
+    "commit": (_commit_active_project, ()),
+}
+
+# Map common incorrect types to correct ones
+TYPE_MAPPING = {
+    "quit_application": "kill_processes_by_name",
+    "close_app": "kill_processes_by_name",
+    "close_application": "kill_processes_by_name",
+    "quit_app": "kill_processes_by_name",
+    "open_google": "open_url",
+    "search_google": "open_url",
+    "open_youtube": "open_url",
+    "focus_mode": "enable_focus_mode",
+    "do_not_disturb": "enable_focus_mode",
+    "turn_on_focus": "enable_focus_mode",
+    "turn_off_focus": "disable_focus_mode",
+    "screenshot": "take_screenshot",
+    "capture_screen": "take_screenshot",
+    "screen_capture": "take_screenshot",
+    "git_update_repo": "commit",
+    "git_update": "commit",
+    "update_repo": "commit",
+    "update_repository": "commit",
+    "save_progress": "commit",
+    "save_work": "commit",
+    "push_changes": "commit",
+    "commit_changes": "commit",
+    "commit": "commit",
+}
+
+# Every accepted type, action names and their aliases, to the action it runs
+CANONICAL_TYPES = {**{name: name for name in ACTIONS}, **TYPE_MAPPING}
+
+# Argument each action can't run without
+REQUIRED_FIELDS = {
+    "open_path": "path",
+    "open_url": "url",
+    "kill_process": "pid",
+    "kill_processes_by_name": "name",
 }
 
 def normalize_args(payload: Dict[str, Any]) -> Dict[str, Any]:
@@ -53,7 +91,7 @@ def main():
 
     # 1) Get JSON command from LLM
     try:
-        payload = llm.generate_json()
+        payload = _llm().generate_json()
         if not isinstance(payload, dict):
             raise ValueError("llm.generate_json() did not return a JSON object.")
     except Exception as e:
@@ -64,58 +102,26 @@ def main():
     t = payload.get("type")
     args = normalize_args(payload)
 
-    # Map common incorrect types to correct ones
-    type_mapping = {
-        "quit_application": "kill_processes_by_name",
-        "close_app": "kill_processes_by_name",
-        "close_application": "kill_processes_by_name",
-        "quit_app": "kill_processes_by_name",
-        "open_google": "open_url",
-        "search_google": "open_url",
-        "open_youtube": "open_url",
-        "focus_mode": "enable_focus_mode",
-        "do_not_disturb": "enable_focus_mode",
-        "turn_on_focus": "enable_focus_mode",
-        "turn_off_focus": "disable_focus_mode",
-        "screenshot": "take_screenshot",
-        "capture_screen": "take_screenshot",
-        "screen_capture": "take_screenshot",
-        "git_update_repo": "commit",
-        "git_update": "commit",
-        "update_repo": "commit",
-        "update_repository": "commit",
-        "save_progress": "commit",
-        "save_work": "commit",
-        "push_changes": "commit",
-        "commit_changes": "commit",
-        "commit": "commit",
-    }
-
-    if t in type_mapping:
-        t = type_mapping[t]
-        payload["type"] = t
-
-    if not t or t not in ACTIONS:
+    # Map common incorrect types to correct ones; one lookup both resolves and validates
+    action = CANONICAL_TYPES.get(t)
+    if action is None:
         print(json.dumps({"ok": False, "error": f"Unsupported or missing type: {t}"}))
         sys.exit(2)
 
+    if action != t:
+        t = action
+        payload["type"] = t
+
     # 3) Per-command checks
-    if t == "open_path" and not args.get("path"):
-        print(json.dumps({"ok": False, "error": "Missing required field: args.path"}))
-        sys.exit(3)
-    if t == "open_url" and not args.get("url"):
-        print(json.dumps({"ok": False, "error": "Missing required field: args.url"}))
-        sys.exit(3)
-    if t == "kill_process" and not args.get("pid"):
-        print(json.dumps({"ok": False, "error": "Missing required field: args.pid"}))
-        sys.exit(3)
-    if t == "kill_processes_by_name" and not args.get("name"):
-        print(json.dumps({"ok": False, "error": "Missing required field: args.name"}))
+    field = REQUIRED_FIELDS.get(t)
+    if field and not args.get(field):
+        print(json.dumps({"ok": False, "error": f"Missing required field: args.{field}"}))
         sys.exit(3)
 
     # 4) Execute action
     try:
-        result = ACTIONS[t](args)
+        fn, spec = ACTIONS[t]
+        result = fn(*[args.get(k, d) for k, d in spec])
     except Exception as e:
         print(json.dumps({"ok": False, "error": f"Action '{t}' failed: {e}"}))
         sys.exit(4)
@@ -132,4 +138,6 @@ def main():
     # sys.exit(0 if result.get("ok") else 5)
 
 if __name__ == "__main__":
+    from logger import start_logging
+    start_logging()
     main()
\ No newline at end of file
@@ -16,17 +16,12 @@ import yaml  # pyyaml (only used to write YAML); if not installed the YAML file
 import base64
 import secrets
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 OUT = Path(r"/Users/alexjshepler/Downloads/test")
 OUT.mkdir(exist_ok=True)
 
 
-def mk(keyname: str, value: str, path: Path):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(f"{keyname}={value}\n")
-
-
 # --------------- helpers that generate fake tokens ---------------
 def fake_ghp():
     return "ghp_" + secrets.token_hex(18)  # matches ghp_[A-Za-z0-9]{36}
@@ -72,109 +67,90 @@ def fake_url_token():
 
 
 # --------------- create files ---------------
+# Every file is built in memory first, then written in one parallel pass below
+files = {}
+
 # .env (typical env file)
-env_path = OUT / ".env"
-env_path.write_text("", encoding="utf-8")
-mk("OPENAI_KEY", fake_sk_long(), env_path)  # should be caught
-mk("OPENAI_KEY_SHORT", fake_sk_short(), env_path)  # may not be caught
-mk("GITHUB_PAT", fake_ghp(), env_path)  # should be caught
-mk("AWS_KEY", fake_ak(), env_path)  # should be caught
-mk("GENERIC_TOKEN", fake_generic_long(), env_path)  # may or may not be caught
+env_vars = [
+    ("OPENAI_KEY", fake_sk_long()),  # should be caught
+    ("OPENAI_KEY_SHORT", fake_sk_short()),  # may not be caught
+    ("GITHUB_PAT", fake_ghp()),  # should be caught
+    ("AWS_KEY", fake_ak()),  # should be caught
+    ("GENERIC_TOKEN", fake_generic_long()),  # may or may not be caught
+]
+files[OUT / ".env"] = "".join(f"{k}={v}\n" for k, v in env_vars)
 
 # config.json (JSON-style key)
-config_path = OUT / "config.json"
 config = {
     "openai": {"key": fake_sk_long()},
     "legacy_short": {"key": fake_sk_short()},
     "service": {"gcloud": fake_gapi()},
 }
-config_path.write_text(json.dumps(config, indent=2), encoding="utf-8")
+files[OUT / "config.json"] = json.dumps(config, indent=2)
 
 # secrets.json (another JSON shape)
-secrets_json_path = OUT / "secrets.json"
-secrets_json_path.write_text(
-    json.dumps(
-        {"stripe_secret": "sk_live_" + secrets.token_hex(16), "jwt": fake_jwt()},
-        indent=2,
-    ),
-    encoding="utf-8",
+files[OUT / "secrets.json"] = json.dumps(
+    {"stripe_secret": "sk_live_" + secrets.token_hex(16), "jwt": fake_jwt()},
+    indent=2,
 )
 
 # credentials.yml (YAML)
-creds_path = OUT / "credentials.yml"
 try:
-    yaml.safe_dump(
+    files[OUT / "credentials.yml"] = yaml.safe_dump(
         {
             "github": {"token": fake_ghp()},
             "aws": {"access_key": fake_ak(), "secret": fake_generic_long()},
-        },
-        open(creds_path, "w", encoding="utf-8"),
+        }
     )
 except Exception:
     # fallback plain text if pyyaml not installed
-    creds_path.write_text(
-        f"github.token: {fake_ghp()}\naws.access_key: {fake_ak()}\n", encoding="utf-8"
+    files[OUT / "credentials.yml"] = (
+        f"github.token: {fake_ghp()}\naws.access_key: {fake_ak()}\n"
     )
 
 # script.sh (shell with exported vars)
 script_path = OUT / "scripts" / "deploy.sh"
-script_path.parent.mkdir(parents=True, exist_ok=True)
-script_path.write_text(
+files[script_path] = (
     "#!/usr/bin/env bash\n"
     f"export OPENAI_API_KEY='{fake_sk_long()}'\n"
     f"export LEGACY_KEY='{fake_sk_short()}'\n"
-    "echo 'deployed'\n",
-    encoding="utf-8",
+    "echo 'deployed'\n"
 )
-os.chmod(script_path, 0o755)
 
 # README.md (contains example inlined and URL)
-readme_path = OUT / "README.md"
-readme_path.write_text(
+files[OUT / "README.md"] = (
     "# Example project\n\n"
     "You might temporarily paste keys like this:\n\n"
     f"- `API_KEY={fake_sk_long()}` (should be flagged)\n"
     f"- `legacy_short=sk-{secrets.token_hex(6)}` (likely not flagged)\n\n"
-    f"Also a URL: https://api.example.com/data?{fake_url_token()}\n",
-    encoding="utf-8",
+    f"Also a URL: https://api.example.com/data?{fake_url_token()}\n"
 )
 
 # url token file
-url_path = OUT / "url_tokens.txt"
-url_path.write_text(f"https://service/?{fake_url_token()}\n", encoding="utf-8")
+files[OUT / "url_tokens.txt"] = f"https://service/?{fake_url_token()}\n"
 
 # jwt token file
-jwt_path = OUT / "tokens" / "jwt.txt"
-jwt_path.parent.mkdir(parents=True, exist_ok=True)
-jwt_path.write_text(fake_jwt() + "\n", encoding="utf-8")
+files[OUT / "tokens" / "jwt.txt"] = fake_jwt() + "\n"
 
 # Create a "hardcoded" python file (simple variant)
-hardcoded_py = OUT / "hardcoded" / "hardcode_example.py"
-hardcoded_py.parent.mkdir(parents=True, exist_ok=True)
-hardcoded_py.write_text(
+files[OUT / "hardcoded" / "hardcode_example.py"] = (
     'API_KEY = "%s"\n\n'
     "def show_key():\n"
     '    print("Using API key (for testing):", API_KEY)\n\n'
     'if __name__ == "__main__":\n'
-    "    show_key()\n" % fake_sk_long(),
-    encoding="utf-8",
+    "    show_key()\n" % fake_sk_long()
 )
 
 # Create another file with keys embedded inside JSON in a JS file (different shape)
-js_path = OUT / "frontend" / "config.js"
-js_path.parent.mkdir(parents=True, exist_ok=True)
-js_path.write_text(
+files[OUT / "frontend" / "config.js"] = (
     "window.__CONFIG__ = {\n"
     f'  "apiKey": "{fake_sk_long()}",\n'
     f'  "shortKey": "{fake_sk_short()}"\n'
-    "};\n",
-    encoding="utf-8",
+    "};\n"
 )
 
 # Create "obscure" placements that may escape your current patterns
-misc_path = OUT / "misc" / "obscure.txt"
-misc_path.parent.mkdir(parents=True, exist_ok=True)
-misc_contents = "\n".join(
+files[OUT / "misc" / "obscure.txt"] = "\n".join(
     [
         "plain_secret=api_key",  # generic long token — might be flagged if you add heuristic
         "jwt_like=" + fake_jwt(),
@@ -183,7 +159,13 @@ misc_contents = "\n".join(
         "base64_secret=" + base64.b64encode(secrets.token_bytes(24)).decode(),
     ]
 )
-misc_path.write_text(misc_contents, encoding="utf-8")
+
+# Each directory is created once, then the files are written concurrently
+for d in {p.parent for p in files}:
+    d.mkdir(parents=True, exist_ok=True)
+with ThreadPoolExecutor(max_workers=8) as ex:
+    list(ex.map(lambda item: item[0].write_text(item[1], encoding="utf-8"), files.items()))
+os.chmod(script_path, 0o755)
 
 print(f"Test workspace created at: {OUT.resolve()}")
 print("Files written:")
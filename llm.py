@@ -1,29 +1,31 @@
 # llm.py
 import os
 import json
+import functools
+import threading
+from pathlib import Path
 # from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-import whisperSTT
+from config import get_config
 # --- Config ---
 # If you keep a custom env file, set GEMINI_ENV_PATH; else default to ".env"
 # ENV_PATH = os.getenv("GEMINI_ENV_PATH", "/Users/y/Desktop/gemini.env")
 # load_dotenv(ENV_PATH) if os.path.exists(ENV_PATH) else load_dotenv()
 
-with open('config.json', 'r') as f:
-    config = json.load(f)
-
-gemini_config = config.get("gemini")
+gemini_config = get_config().get("gemini")
 
 API_KEY = gemini_config.get('key')
 MODEL_ID = gemini_config.get('model')
 
-# Optional: bring in your system/few-shot content if you actually use them
-SYSTEM = open("prompts/system_strict_json.txt").read()
-FEWSHOT = open("prompts/fewshot.txt").read()
+# Optional: bring in your system/few-shot content if you actually use them.
+# Read on first use and kept, instead of opened (and never closed) at import
+@functools.cache
+def _system() -> str:
+    return Path("prompts/system_strict_json.txt").read_text(encoding="utf-8")
 
-# --- Client ---
-client = genai.Client(api_key=API_KEY)
+@functools.cache
+def _fewshot() -> str:
+    # Stripped once here rather than on every prompt
+    return Path("prompts/fewshot.txt").read_text(encoding="utf-8").strip()
 
 # --- System instruction (tightened) ---
 system_instruction = """
@@ -49,47 +51,76 @@ Rules:
 """.strip()
 
 
-# Generation config: force JSON mime; optionally lower temperature for stricter format
-chat_config = types.GenerateContentConfig(
-    system_instruction=api_key,
-    response_mime_type=api_key_llm,
-    # temperature=0.2,  # uncomment for stricter formatting
-)
+# The Gemini SDK (and whisper, in whisperSTT) take seconds to import, so they are only loaded
+# the first time a command actually needs them, not when this module is imported
 
-chat = client.chats.create(
-    model=MODEL_ID,
-    config=chat_config,
-)
+# --- Client ---
+@functools.cache
+def _client():
+    from google import genai
+    return genai.Client(api_key=API_KEY)
+
+# Generation config: force JSON mime; optionally lower temperature for stricter format.
+# The few-shot examples are part of the system instruction, so they are set once on the chat
+# instead of being prepended to (and kept in the history with) every user message
+@functools.cache
+def _chat_config():
+    from google.genai import types
+    fewshot = _fewshot()
+    return types.GenerateContentConfig(
+        system_instruction=system_instruction + ("\n\nExamples:\n" + fewshot if fewshot else ""),
+        response_mime_type="application/json",
+        # temperature=0.2,  # uncomment for stricter formatting
+    )
+
+@functools.cache
+def _chat():
+    return _client().chats.create(
+        model=MODEL_ID,
+        config=_chat_config(),
+    )
+
+def _parse_response(response):
+    # Pull the text out of a Gemini response and parse it as the JSON command
+    text = getattr(response, "text", None)
+
+    if not text and hasattr(response, "candidates") and response.candidates:
+        parts = []
+        for c in response.candidates:
+            if getattr(c, "content", None) and getattr(c.content, "parts", None):
+                for p in c.content.parts:
+                    if getattr(p, "text", None):
+                        parts.append(p.text)
+        text = "\n".join(parts) if parts else None
+
+    if not text:
+        raise RuntimeError("Model returned no text. Inspect `response` object for details.")
+
+    # Parse JSON
+    obj = json.loads(text)
+
+    # Optional: jsonschema.validate(obj, schema)
+    return obj  # return a dict
+
+def _warm_up():
+    # Everything the request needs besides the transcript: the SDK import, client and chat
+    # (with the few-shot prompt). Run while the user is speaking so none of it is paid after
+    _chat()
 
 def generate_json():
+    warm_up = threading.Thread(target=_warm_up, daemon=True)
+    warm_up.start()
+    import whisperSTT
+
     # 1) Get voice text
     user_prompt = whisperSTT.take_prompt()
-
-    # 2) Build the actual prompt once
-    prompt = (FEWSHOT.strip() + user_prompt) if FEWSHOT else user_prompt
+    # A failed warm-up is retried (and reported) by the calls below
+    warm_up.join()
 
     try:
-        response = chat.send_message(prompt)
-
-        text = getattr(response, "text", None)
-
-        if not text and hasattr(response, "candidates") and response.candidates:
-            parts = []
-            for c in response.candidates:
-                if getattr(c, "content", None) and getattr(c.content, "parts", None):
-                    for p in c.content.parts:
-                        if getattr(p, "text", None):
-                            parts.append(p.text)
-            text = "\n".join(parts) if parts else None
-
-        if not text:
-            raise RuntimeError("Model returned no text. Inspect `response` object for details.")
-
-        # Parse JSON
-        obj = json.loads(text)
-
-        # Optional: jsonschema.validate(obj, schema)
-        return obj  # return a dict
+        # 2) Send just the request; the examples are in the system instruction
+        response = _chat().send_message(user_prompt)
+        return _parse_response(response)
 
     except Exception as e:
         # Surface useful debugging info
@@ -0,0 +1,31 @@
+# logger.py
+import atexit
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Logger for the workflows. Records are put on a queue and written out by a background
+# thread, so a slow terminal never holds up the work that logged them
+log = logging.getLogger("vibe")
+
+_listener = None
+
+def start_logging(level: int = logging.INFO) -> None:
+    """Send `log` records to stdout through a QueueListener thread (safe to call more than once)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    q = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+
+    log.setLevel(level)
+    log.addHandler(QueueHandler(q))
+    log.propagate = False
+
+    _listener = QueueListener(q, handler)
+    _listener.start()
+    # Drain whatever is still queued before the interpreter exits
+    atexit.register(_listener.stop)
@@ -4,6 +4,8 @@ import speech_recognition as sr
 
 import server
 from server import get_cwd
+from config import get_config
+from logger import start_logging
 
 
 def check_config():
@@ -33,21 +35,24 @@ def check_config():
         )
 
     if config.get("default_mic") == None:
+        # Enumerating devices goes through PortAudio, so list them once and validate against that list
+        mic_names = sr.Microphone.list_microphone_names()
         while True:
-            for i, name in enumerate(sr.Microphone.list_microphone_names()):
+            for i, name in enumerate(mic_names):
                 print(f"{i}: {name}")
 
             user_mic_input = int(input("Please select the default microphone to use: "))
 
-            if user_mic_input >= 0 and user_mic_input < len(
-                sr.Microphone.list_microphone_names()
-            ):
+            if user_mic_input >= 0 and user_mic_input < len(mic_names):
                 config["default_mic"] = user_mic_input
                 break
 
     with open("config.json", "w") as f:
         f.write(json.dumps(config, indent=4))
 
+    # Modules that read the config after this point should see the new file
+    get_config.cache_clear()
+
 
 def main():
     # Start the server
@@ -55,6 +60,7 @@ def main():
         # print("Starting the server...")
         # thread.start()
 
+    start_logging()
     check_config()
     import arduino_trigger
 
@@ -1,67 +1,189 @@
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import http.client
 import json
-import urllib.request
+import threading
+import time
+import urllib.parse
 
 last = {"path": None, "ts": None}
+# Requests are handled on their own threads, so `last` is only read or written under this lock
+last_lock = threading.Lock()
+
+# The GET response only changes when a POST changes `last`, so it is encoded once per change.
+# _version is bumped on every change and sent as the ETag, so get_cwd can revalidate with If-None-Match.
+# The start time is part of the ETag so a restarted server never matches a tag from the old one
+_boot = f"{time.time_ns():x}"
+_version = 0
+_cached_response = b'{"ok": true, "data": {"path": null, "ts": null}}'
+
+
+# get_cwd answers from this cache for CWD_CACHE_TTL seconds instead of asking the server again,
+# and talks to the server over one kept-alive connection per server_url
+CWD_CACHE_TTL = 0.25
+_cwd_cache = {}  # server_url -> (monotonic deadline, path)
+_connections = {}  # server_url -> http.client.HTTPConnection
+_connections_lock = threading.Lock()
+_cwd_etags = {}  # server_url -> (etag, path) of the last 200 response
+
+
+def invalidate_cwd_cache() -> None:
+    """Make the next get_cwd call ask the server again."""
+    _cwd_cache.clear()
+
+
+def _get_json(server_url: str, path: str, headers: dict) -> tuple[int, str | None, dict | None]:
+    # Callers hold _connections_lock: an HTTPConnection can only carry one request at a time
+    conn = _connections.get(server_url)
+    if conn is None:
+        url = urllib.parse.urlsplit(server_url)
+        conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=2)
+        _connections[server_url] = conn
+
+    try:
+        conn.request("GET", path, headers=headers)
+        resp = conn.getresponse()
+    except (http.client.HTTPException, ConnectionError):
+        # The kept-alive socket went stale (e.g. the server restarted): reconnect once
+        conn.close()
+        conn.request("GET", path, headers=headers)
+        resp = conn.getresponse()
+
+    body = resp.read()
+    if resp.status == 304:
+        return 304, resp.getheader("ETag"), None
+    return resp.status, resp.getheader("ETag"), json.loads(body)
 
 
 def get_cwd(server_url: str = "http://127.0.0.1:8765") -> str | None:
     """Return the most recently active VS Code project directory, or None if none yet."""
+    hit = _cwd_cache.get(server_url)
+    if hit and time.monotonic() < hit[0]:
+        return hit[1]
+
+    known = _cwd_etags.get(server_url)
+    headers = {"If-None-Match": known[0]} if known else {}
+
     try:
-        with urllib.request.urlopen(f"{server_url}/active-project") as resp:
-            data = json.load(resp)
-            return (data.get("data") or {}).get("path")
+        with _connections_lock:
+            status, etag, data = _get_json(server_url, "/active-project", headers)
+        if status == 304 and known:
+            path = known[1]
+        else:
+            path = (data.get("data") or {}).get("path")
+            if etag:
+                _cwd_etags[server_url] = (etag, path)
     except Exception as e:
         # print(f"[get_cwd] Error getting active project: {e}")
         return None
 
+    _cwd_cache[server_url] = (time.monotonic() + CWD_CACHE_TTL, path)
+    return path
+
+
+# Focus pings are a path and a timestamp; anything bigger than this is refused unread
+MAX_BODY = 65536
+
 
 class Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests (get_cwd reuses its connection), which
+    # needs a Content-Length on every response
+    protocol_version = "HTTP/1.1"
+    # On a kept-alive connection Nagle would hold the body back until the client ACKs the
+    # headers, and the client delays that ACK (~40ms per request)
+    disable_nagle_algorithm = True
+    # Buffer the response so the status line, headers and body leave in one send;
+    # handle_one_request flushes wfile once the handler returns
+    wbufsize = 64 * 1024
+
     def do_POST(self):
         if self.path != "/project-focus":
             self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            # The body wasn't read, so this connection can't carry another request
+            self.close_connection = True
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_BODY:
+            self.send_response(413 if length > MAX_BODY else 400)
+            self.send_header("Content-Length", "0")
             self.end_headers()
+            # The body wasn't read, so this connection can't carry another request
+            self.close_connection = True
             return
 
-        length = int(self.headers.get("Content-Length", 0))
-        body = self.rfile.read(length)
+        # Read straight into one buffer; readinto can return short, so loop until it's full
+        body = bytearray(length)
+        view = memoryview(body)
+        n = 0
+        while n < length:
+            got = self.rfile.readinto(view[n:])
+            if not got:
+                break
+            n += got
 
         try:
-            data = json.loads(body)
+            data = json.loads(body[:n])
             new_path = data.get("path")
             new_ts = data.get("ts")
 
-            # Only print if it actually changed
-            if new_path and new_path != last.get("path"):
-                print(f"[Updated CWD] {new_path}")
-                pass
+            global _version, _cached_response
+            with last_lock:
+                # Only print if it actually changed
+                if new_path and new_path != last.get("path"):
+                    print(f"[Updated CWD] {new_path}")
+                    pass
 
-            last["path"] = new_path
-            last["ts"] = new_ts
+                if new_path != last["path"] or new_ts != last["ts"]:
+                    last["path"] = new_path
+                    last["ts"] = new_ts
+                    _cached_response = json.dumps({"ok": True, "data": last}).encode()
+                    _version += 1
+            # A get_cwd in this process shouldn't keep returning the old project
+            invalidate_cwd_cache()
 
             self.send_response(200)
+            self.send_header("Content-Length", "12")
             self.end_headers()
             self.wfile.write(b'{"ok": true}')
 
         except Exception as e:
             # print(f"[Error parsing POST] {e}")
             self.send_response(400)
+            self.send_header("Content-Length", "0")
             self.end_headers()
 
     def do_GET(self):
         if self.path != "/active-project":
             self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        with last_lock:
+            body, etag = _cached_response, f'"{_boot}-{_version}"'
+
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
             self.end_headers()
             return
 
         self.send_response(200)
         self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
         self.end_headers()
-        self.wfile.write(json.dumps({"ok": True, "data": last}).encode())
+        self.wfile.write(body)
 
 def main():
     print("Server listening on http://127.0.0.1:8765 ...")
-    HTTPServer(("127.0.0.1", 8765), Handler).serve_forever()
+    # One thread per connection, so a slow client can't hold up the focus pings or get_cwd
+    ThreadingHTTPServer(("127.0.0.1", 8765), Handler).serve_forever()
     
 if __name__ == "__main__":
     main()
@@ -7,16 +7,14 @@ import torch
 from datetime import datetime, timedelta
 from queue import Queue
 from time import sleep
-import json
+
+from config import get_config
 
 # Load / Download model
 model = "tiny.en"
 audio_model = whisper.load_model(model)
 
-with open('config.json', 'r') as f:
-    config = json.load(f)
-
-DEVICE_INDEX_INPUT = config.get("default_mic")
+DEVICE_INDEX_INPUT = get_config().get("default_mic")
 
 def take_prompt():
     parser = argparse.ArgumentParser()
@@ -53,7 +51,7 @@ def take_prompt():
     # Definitely do this, dynamic energy compensation lowers the energy threshold dramatically to a point where the SpeechRecognizer never stops recording.
     recorder.dynamic_energy_threshold = False
     # select the Microphone
-    source = sr.Microphone(device_index=api_key, sample_rate=16000)
+    source = sr.Microphone(device_index=DEVICE_INDEX_INPUT, sample_rate=16000)
 
     record_timeout = args.record_timeout
     phrase_timeout = args.phrase_timeout
@@ -1,19 +1,11 @@
-import json
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 
-from google import genai
 from git import Repo, GitCommandError, InvalidGitRepositoryError, NoSuchPathError
 
-from RepoHelpers import get_git_root, fetch_from_remote, anything_staged, sanitize_staged_secrets_in_index, llm_scan_staged_secrets_in_index, generate_commit_message
-
-# Load config
-with open('config.json', 'r') as f:
-    config = json.load(f)
-
-gemini_config = config.get('gemini')
-api_key = gemini_config.get('key')
-model = gemini_config.get('model')
+from logger import log
+from RepoHelpers import get_git_root, fetch_repo_dir, invalidate_fetch_cache, anything_staged, staged_manifest, scan_staged_for_secrets, collect_commit_context, generate_commit_message
 
 # Auto commit
 def auto_commit(repo_path: Optional[str]) -> dict:
@@ -32,91 +24,104 @@ def auto_commit(repo_path: Optional[str]) -> dict:
 
     # Exit early if not in a git repo
     if repo is None:
-        print('Not a git repo')
+        log.info('Not a git repo')
         return {
             "ok": False,
             "error": f"Not a git repository: {repo_path}",
             "path": repo_path
         }
 
-    # Fetch from remote
-    if repo.remotes:
-        try:
-            api_key(repo)
-        except Exception as e:
-            print(f'Fetch failed: {e}\n')
-            return {
-                "ok": True,
-                "warn": f"Repository does not have a remote: {repo_path}",
-                "path": repo_path,
-            }
-
     # Stage changes
-    print("Staging all changes")
+    log.info("Staging all changes")
     repo.git.add(A=True)
 
-    # Check if anything got staged
+    # Check if anything got staged. Nothing to commit means nothing to fetch for either
     if not anything_staged(repo):
-        print('No changes have been made')
+        log.info('No changes have been made')
         return {"ok": True, "message": "Nothing to commit", "path": repo_path}
 
-    return_message = ""
+    # Fetch from remote on a thread; it's only needed before the push, so it runs behind the scans.
+    # Leaving the block (including on an error in the scans) waits for both workers
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        fetch_future = ex.submit(fetch_repo_dir, repo.working_dir) if repo.remotes else None
 
-    # Scan for secrets
-    print('Scanning for secrets (regex)')
-    sanitized = api_key(repo)
+        # List the staged changes once; the scans and the commit message all work from this
+        staged = staged_manifest(repo)
 
-    if sanitized:
-        print('Sanitized staged secrets in: ')
-        for i in sanitized:
-            print(f'\t- {i}')
+        return_message = ""
 
-        return_message = f"I've found and redacted secrets in the following files:\n"
-        for i in sanitized:
-            return_message += f'{i["path"]} '
+        # Scan for secrets: regex, then (maybe) Gemini, reading each staged file once. The project
+        # context for the commit message doesn't depend on the scan, so it is collected on a thread
+        # while the Gemini requests are in flight
+        log.info('Scanning for secrets (regex + Gemini)')
+        ctx_future = ex.submit(collect_commit_context, repo.working_tree_dir, staged)
+        sanitized, llm_results = scan_staged_for_secrets(repo, staged)
+        try:
+            ctx = ctx_future.result()
+        except Exception as e:
+            # generate_commit_message collects it again itself
+            log.warning(f'Context collection failed: {e}')
+            ctx = None
 
-        return_message += '\n\n'
+        if sanitized:
+            log.info('Sanitized staged secrets in: ')
+            for i in sanitized:
+                log.info(f'\t- {i}')
 
-    # (Maybe) LLM scans for secrets
-    print('Scanning for secrets (Gemini)')
-    llm_results = api_key(repo)
+            return_message = f"I've found and redacted secrets in the following files:\n"
+            for i in sanitized:
+                return_message += f'{i["path"]} '
 
-    if llm_results:
-        print("Sanitized staged secrets in LLM pass:")
+            return_message += '\n\n'
 
-        for r in llm_results:
-            print(f"\t-{r['path']} ({r['replaced_count']} replacements)")
+        if llm_results:
+            log.info("Sanitized staged secrets in LLM pass:")
 
-            for note in r.get("notes", [])[:3]:
-                print(f'\t\t -- {note}')
+            for r in llm_results:
+                log.info(f"\t-{r['path']} ({r['replaced_count']} replacements)")
 
-        if return_message == "":
-            return_message = "I've found and redacte secrets in the following files:\n"
-            for i in llm_results:
-                return_message += f'{i["path"]}'
-        else:
-            return_message += "I also found some trickier secrets in:\n"
-            for i in llm_results:
-                api_key f'{i["path"]}'
+                for note in r.get("notes", [])[:3]:
+                    log.info(f'\t\t -- {note}')
 
-    # Generate commit message
-    print("Generating commit message")
-    commit_message = api_key(repo, sanitized, llm_results)
-    print(f'Commit message:\n{commit_message}')
+            if return_message == "":
+                return_message = "I've found and redacte secrets in the following files:\n"
+                for i in llm_results:
+                    return_message += f'{i["path"]}'
+            else:
+                return_message += "I also found some trickier secrets in:\n"
+                for i in llm_results:
+                    return_message += f'{i["path"]} '
 
-    # Commit the changes
-    try:
-        commit_obj = repo.index.commit(commit_message)
-        print(f"✅ Created commit: {commit_obj.hexsha[:8]} - {commit_obj.summary}")
+        # Generate commit message
+        log.info("Generating commit message")
+        commit_message = generate_commit_message(repo, sanitized, llm_results, ctx=ctx, staged=staged)
+        log.info(f'Commit message:\n{commit_message}')
 
-        return_message += f"\n\n\nI've successfully commited the repository with the commit message:\n{commit_message}"
-    except Exception as e:
-        print(f"❌ Failed to commit changes: {e}")
-        return {
-            "ok": False,
-            "error": f"auto_commit failed while committing: {e}",
-            "path": repo_path,
-        }
+        # Commit the changes
+        try:
+            commit_obj = repo.index.commit(commit_message)
+            log.info(f"✅ Created commit: {commit_obj.hexsha[:8]} - {commit_obj.summary}")
+
+            return_message += f"\n\n\nI've successfully commited the repository with the commit message:\n{commit_message}"
+        except Exception as e:
+            log.error(f"❌ Failed to commit changes: {e}")
+            return {
+                "ok": False,
+                "error": f"auto_commit failed while committing: {e}",
+                "path": repo_path,
+            }
+
+        # Wait for the fetch before pushing. fetch_from_remote reports its own git errors as False
+        if fetch_future is not None:
+            try:
+                fetched = fetch_future.result()
+            except Exception as e:
+                log.warning(f'Fetch failed: {e}')
+                fetched = False
+
+            if not fetched:
+                return_message += "\n\nI couldn't reach the remote, so the commit is only local for now"
+                return {"ok": True, "warn": "Fetch failed, skipped the push", "message": return_message, "path": repo_path}
 
     # Push the commit
     try:
@@ -126,19 +131,21 @@ def auto_commit(repo_path: Optional[str]) -> dict:
             except:
                 remote = repo.remotes[0]
 
-            print(f'Pushing to remote {remote.name}...')
+            log.info(f'Pushing to remote {remote.name}...')
             push_info =remote.push()
 
             if push_info and push_info[0].flags & push_info[0].ERROR:
-                print(f'Push error: {push_info[0].summary}')
+                log.error(f'Push error: {push_info[0].summary}')
                 return_message += f"\n\nUnfortunatley it looks like we've ran into a push error. I got the error:\n{push_info[0].summary}"
             else:
-                print(f'Successfully pushed to {remote.name}')
+                # The remote just moved, so the next run has to fetch again
+                invalidate_fetch_cache(repo)
+                log.info(f'Successfully pushed to {remote.name}')
                 return_message += f"\nAnd your changes have successfully been pushed to remote"
         else:
-            print(f'No remote configured, committed locally only')
+            log.info(f'No remote configured, committed locally only')
     except GitCommandError as e:
-        print(f'Push failed: {e}')
+        log.error(f'Push failed: {e}')
 
     return {"ok": True, "message": return_message, "path": repo_path}
 